@@ -8,173 +8,373 @@ Environment variables expected:
  - GEMINI_API_KEY -> The API key for the Gemini service.
  - LLM_MODEL      -> Optional model identifier (default: 'gemini-2.0-flash').
  
-NOTE: All debugging prints, caching, and fallback logic have been removed.
+Successful plans are cached in-process for a day, keyed on the normalized
+request, so repeated requests skip the Gemini round-trip.
 """
 
 import os
-import json
+import asyncio
+import difflib
+import hashlib
+import logging
+import mmap
+import sys
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Optional, Union
+from typing import AsyncIterator, List, Dict, NamedTuple, Optional, Tuple, Union
+import httpx
+from cachetools import TTLCache
+import orjson
 from google import genai
-from google.genai import types
-import re # Keep regex for robust JSON parsing
+from google.genai import errors, types
+from pydantic import BaseModel
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential_jitter
+import re
 
 # --- Configuration & Initialization ---
 
+logger = logging.getLogger("klassiq.lesson_generator")
+
 # Environment variables - hardcoded for deployment stability
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', "key")
 LLM_MODEL = 'gemini-2.0-flash'  # Use latest stable flash model
 
+# Output token caps per output mode (Gemini latency grows with output length)
+FULL_MAX_OUTPUT_TOKENS = 1200
+SHORT_MAX_OUTPUT_TOKENS = 400
+
+# Approximate token budgets for the curriculum context sent with each prompt
+OBJECTIVES_TOKEN_BUDGET = 150
+CONTENT_TOKEN_BUDGET = 125
+ACTIVITIES_TOKEN_BUDGET = 75
+CONTEXT_TOKEN_BUDGET = 1000
+
+# Merged curriculum map produced by utils/merge_curriculums.py
+CURRICULUM_PATH = Path(__file__).resolve().parents[1] / "data" / "curriculum_map.json"
+# Per-subject sorted topic names written by utils/merge_curriculums.py
+TOPICS_INDEX_KEY = "_TOPICS_INDEX"
+# (path, mtime) of the map currently held by _load_curriculum
+_loaded_curriculum: Optional[Tuple[Path, float]] = None
+
+# Generated plans keyed by _request_key; identical requests within a day skip Gemini
+_response_cache: TTLCache = TTLCache(maxsize=2048, ttl=86400)
+# Generations currently running, keyed by _request_key (singleflight)
+_inflight: Dict[bytes, asyncio.Future] = {}
+
+# Request coalescing: under load, concurrent generations are packed into one
+# Gemini call of up to BATCH_MAX lessons (see _complete). A batch's summed
+# output caps must fit in the model's output limit.
+MODEL_MAX_OUTPUT_TOKENS = 8192
+BATCH_MAX = MODEL_MAX_OUTPUT_TOKENS // FULL_MAX_OUTPUT_TOKENS
+BATCH_WINDOW_MS = 50
+_batch_queue: Optional[asyncio.Queue] = None
+_batch_worker: Optional[asyncio.Task] = None
+# Running _call_llm_batch tasks, referenced here so they aren't garbage collected mid-call
+_batch_tasks: set = set()
+_llm_calls_in_flight = 0
+
 # Initialize Gemini Client (will be set when API key is available)
 CLIENT = None
 
 def _ensure_client():
     """Initialize the Gemini client if not already done."""
     global CLIENT
-    print(f"🔑 _ensure_client called, CLIENT is: {CLIENT}")
     if CLIENT is None:
-        print(f"🔐 API key check: {GEMINI_API_KEY[:10]}..." if GEMINI_API_KEY else "❌ No API key")
         if not GEMINI_API_KEY:
-            print(f"❌ GEMINI_API_KEY is missing!")
+            logger.error("❌ GEMINI_API_KEY is missing!")
             raise ValueError(
                 "GEMINI_API_KEY environment variable is required for API client initialization. "
                 "Please set this environment variable in your deployment settings (Render.com dashboard > Environment tab) "
                 "with a valid Google Gemini API key from https://aistudio.google.com/app/apikey"
             )
-        print(f"🚀 Initializing Gemini client...")
         CLIENT = genai.Client(api_key=GEMINI_API_KEY)
-        print('✅ Gemini api loaded successfully')
-    else:
-        print(f"♻️ Using existing Gemini client")
+        logger.info("✅ Gemini client initialized")
     return CLIENT
 
 
 # --- Utility Functions: Normalization ---
 
+# Lookup tables are built once at import instead of on every call
+# Grade patterns tried in order; the first match decides the curriculum band.
+# Anything with "js"/"junior secondary" is JSS; "pri"/"primary" is split on the
+# first digit after it (4-6 upper primary, otherwise lower primary).
+_GRADE_PATTERNS = (
+    (re.compile(r'js|junior secondary'), lambda m: "Junior Secondary 1–3"),
+    (re.compile(r'pri\D*(\d)?'), lambda m: "Primary 4–6" if m.group(1) in ("4", "5", "6") else "Primary 1–3"),
+)
+
+_SUBJECT_MAPPINGS = {
+    'english': 'english_studies',
+    'mathematics': 'maths',
+    'math': 'maths',
+    'science': 'basic_science_technology',
+    'basic science': 'basic_science_technology',
+    'technology': 'basic_science_technology',
+    'creative arts': 'cca',
+    'arts': 'cca',
+    'crs': 'crs',
+    'christian religious studies': 'crs',
+    'islamic studies': 'islamic',
+    'islamic': 'islamic',
+    'hausa': 'hausa',
+    'igbo': 'igbo',
+    'yoruba': 'yoruba',
+    'french': 'french',
+    'arabic': 'arabic',
+    'history': 'history',
+    'nvc': 'nvc',
+    'prevoc': 'prevoc'
+}
+
+
 def normalize_grade(grade: str) -> str:
     """Normalize grade input to match curriculum structure."""
     grade_lower = grade.lower().strip()
-    
-    # JSS mappings
-    if any(term in grade_lower for term in ['jss', 'junior secondary', 'js']):
-        return "Junior Secondary 1–3"
-    
-    # Primary mappings
-    if 'primary' in grade_lower or 'pri' in grade_lower:
-        for char in grade_lower:
-            if char.isdigit():
-                num = int(char)
-                if num in [1, 2, 3]:
-                    return "Primary 1–3"
-                elif num in [4, 5, 6]:
-                    return "Primary 4–6"
-                break
-        return "Primary 1–3"
-    
-    # Direct matches
-    grade_mappings = {
-        "junior secondary 1–3": "Junior Secondary 1–3",
-        "primary 1–3": "Primary 1–3", 
-        "primary 4–6": "Primary 4–6"
-    }
-    
-    return grade_mappings.get(grade_lower, grade)
+    for pattern, band in _GRADE_PATTERNS:
+        m = pattern.search(grade_lower)
+        if m:
+            return band(m)
+    return grade
 
 
 def normalize_subject(subject: str) -> str:
     """Normalize subject input to match curriculum structure."""
-    subject_lower = subject.lower().strip()
+    return _SUBJECT_MAPPINGS.get(subject.lower().strip(), subject)
+
+
+# --- Curriculum Retrieval ---
+
+class CurriculumCache(NamedTuple):
+    """Parsed curriculum map plus lookup structures derived from it once per load."""
+    data: Dict
+    # (grade, subject) -> {lowercased topic name: topic node}, in document order
+    topic_index: Dict[Tuple[str, str], Dict[str, Dict]]
+    # (grade, subject) -> sorted, de-duplicated topic names as listed under "TOPICS"
+    topic_names: Dict[Tuple[str, str], List[str]]
+    # Grade names and each grade's subject identifiers, in document order
+    grades: List[str]
+    subjects_by_grade: Dict[str, List[str]]
+
+
+def _index_topics(subject_data: Union[Dict, List]) -> Dict[str, Dict]:
+    """
+    Collect every topic node under a subject, keyed by its lowercased name (first occurrence wins).
+
+    Names are lowercased once here and interned, so lookups never re-normalize node names.
+    """
+    topics: Dict[str, Dict] = {}
+    # Iterative pre-order walk (parsed JSON only holds exact dicts/lists);
+    # children are pushed in reverse so topics are met in document order
+    stack = [subject_data]
+    pop, push = stack.pop, stack.append
+    while stack:
+        node = pop()
+        if type(node) is dict:
+            if "TOPIC NAME" in node:
+                topics.setdefault(sys.intern(node["TOPIC NAME"].lower().strip()), node)
+            children = list(node.values())
+        else:
+            children = node
+        for child in reversed(children):
+            if type(child) is dict or type(child) is list:
+                push(child)
+    return topics
+
+
+def _list_topic_names(subject_data: Union[Dict, List]) -> List[str]:
+    """Sorted, de-duplicated names of the topics listed under every "TOPICS" key."""
+    # Precomputed by utils/merge_curriculums.py; walk the tree only for maps merged before it existed
+    if type(subject_data) is dict and type(subject_data.get(TOPICS_INDEX_KEY)) is list:
+        return subject_data[TOPICS_INDEX_KEY]
+    topics = set()
+    stack = [subject_data]
+    pop, push = stack.pop, stack.append
+    while stack:
+        node = pop()
+        if type(node) is dict:
+            listed = node.get("TOPICS")
+            if type(listed) is list:
+                for topic_item in listed:
+                    if type(topic_item) is dict and "TOPIC NAME" in topic_item:
+                        topics.add(topic_item["TOPIC NAME"])
+            children = node.values()
+        else:
+            children = node
+        for child in children:
+            if type(child) is dict or type(child) is list:
+                push(child)
+    return sorted(topics)
+
+
+def _build_curriculum_cache(curriculum_data: Dict) -> CurriculumCache:
+    """Derive the topic index, topic listings and grade/subject listings from the parsed curriculum map."""
+    topic_index = {}
+    topic_names = {}
+    for grade, subjects in curriculum_data.items():
+        for subject, subject_data in subjects.items():
+            topic_index[(grade, subject)] = _index_topics(subject_data)
+            topic_names[(grade, subject)] = _list_topic_names(subject_data)
+    subjects_by_grade = {grade: list(subjects.keys()) for grade, subjects in curriculum_data.items()}
+    return CurriculumCache(curriculum_data, topic_index, topic_names, list(subjects_by_grade), subjects_by_grade)
+
+
+def _read_json_mmap(path: Path) -> Dict:
+    """
+    Parse a JSON file straight out of a read-only mmap, so the raw text is
+    never copied into a Python bytes object alongside the parsed tree.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return orjson.loads(b"")  # mmap can't map an empty file; let orjson raise
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+@lru_cache(maxsize=1)
+def _load_curriculum(path: Path, mtime: float) -> CurriculumCache:
+    """Parse the curriculum map and build its indexes. Cached per (path, mtime) so a changed file is re-read."""
+    global _loaded_curriculum
+    cache = _build_curriculum_cache(_read_json_mmap(path))
+    _loaded_curriculum = (path, mtime)
+    return cache
+
+
+async def _ensure_curriculum_loaded(mtime: float) -> None:
+    """
+    Make sure the map at mtime is the loaded one before sync code reads it.
+
+    A first load or a reload after the file changed (JSON parse plus index
+    build) runs in a worker thread; when it is already loaded there is no
+    thread hop at all.
+    """
+    if _loaded_curriculum != (CURRICULUM_PATH, mtime):
+        await asyncio.to_thread(_load_curriculum, CURRICULUM_PATH, mtime)
+
+
+def _curriculum_cache() -> CurriculumCache:
+    """Return the loaded curriculum; one stat() per call re-validates it against the file on disk."""
+    try:
+        mtime = CURRICULUM_PATH.stat().st_mtime
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Curriculum map not found at {CURRICULUM_PATH}") from None
+    return _load_curriculum(CURRICULUM_PATH, mtime)
+
+
+def _curriculum_mtime() -> Optional[float]:
+    """mtime of the curriculum map on disk, or None when it is missing."""
+    try:
+        return CURRICULUM_PATH.stat().st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def load_curriculum() -> Dict:
+    """Return the parsed curriculum map, only touching the disk when the file has changed."""
+    return _curriculum_cache().data
+
+
+def get_topic_index() -> Dict[Tuple[str, str], Dict[str, Dict]]:
+    """Return the (grade, subject) -> {lowercased topic name: topic node} index."""
+    return _curriculum_cache().topic_index
+
+
+def list_grades() -> List[str]:
+    """Grade names in the curriculum map. Shared list; callers must not mutate it."""
+    return _curriculum_cache().grades
+
+
+def get_subjects_by_grade() -> Dict[str, List[str]]:
+    """Grade -> subject identifiers. Shared dict; callers must not mutate it."""
+    return _curriculum_cache().subjects_by_grade
+
+
+def list_topics(grade: str, subject: str) -> List[str]:
+    """Sorted, de-duplicated topic names for an exact (grade, subject) pair."""
+    return _curriculum_cache().topic_names.get((grade, subject), [])
+
+
+def _lookup_curriculum_objectives(cache: CurriculumCache, grade: str, subject: str, topic: str) -> Dict[str, Union[List[str], str]]:
+    """Find a topic in the parsed curriculum map and map it to the objectives structure."""
+    grade = normalize_grade(grade)
+    subject = normalize_subject(subject)
+    curriculum_data = cache.data
+        
+    if grade not in curriculum_data:
+        return {"error": f"Grade '{grade}' not found. Available: {list(curriculum_data.keys())}"}
+        
+    grade_data = curriculum_data[grade]
     
-    subject_mappings = {
-        'english': 'english_studies',
-        'mathematics': 'maths',
-        'math': 'maths',
-        'science': 'basic_science_technology',
-        'basic science': 'basic_science_technology',
-        'technology': 'basic_science_technology',
-        'creative arts': 'cca',
-        'arts': 'cca',
-        'crs': 'crs',
-        'christian religious studies': 'crs',
-        'islamic studies': 'islamic',
-        'islamic': 'islamic',
-        'hausa': 'hausa',
-        'igbo': 'igbo',
-        'yoruba': 'yoruba',
-        'french': 'french',
-        'arabic': 'arabic',
-        'history': 'history',
-        'nvc': 'nvc',
-        'prevoc': 'prevoc'
-    }
+    if subject not in grade_data:
+        return {"error": f"Subject '{subject}' not found in {grade}. Available: {list(grade_data.keys())}"}
+        
+    # Exact match first, then the search as whole words inside a topic name,
+    # then the closest fuzzy match (catches typos and reworded topics)
+    topics = cache.topic_index[(grade, subject)]
+    search_topic_lower = topic.lower().strip()
+    topic_data = topics.get(search_topic_lower)
+    if topic_data is None and search_topic_lower:
+        word_match = re.compile(rf"\b{re.escape(search_topic_lower)}\b")
+        topic_data = next(
+            (node for name, node in topics.items() if word_match.search(name)),
+            None
+        )
+    if topic_data is None:
+        close = difflib.get_close_matches(search_topic_lower, topics.keys(), n=1, cutoff=0.75)
+        if close:
+            topic_data = topics[close[0]]
+    
+    if not topic_data:
+        return {"error": f"Topic '{topic}' not found in {subject} for {grade}"}
     
-    return subject_mappings.get(subject_lower, subject)
+    # Extract and map the curriculum information
+    result = {
+        "objectives": topic_data.get("PERFORMANCE OBJECTIVES", []),
+        "content": topic_data.get("CONTENT", []),
+        "teacher_activities": topic_data.get("TEACHER ACTIVITIES", []),
+        "student_activities": topic_data.get("STUDENTS ACTIVITIES", topic_data.get("PUPILS ACTIVITIES", [])),
+        "resources": topic_data.get("TEACHING AND LEARNING RESOURCES", []),
+        "topic_name": topic_data.get("TOPIC NAME", topic)
+    }
+    return result
 
 
-# --- Curriculum Retrieval ---
+@lru_cache(maxsize=4096)
+def _memoized_objectives(grade: str, subject: str, topic: str, curriculum_mtime: float) -> Dict[str, Union[List[str], str]]:
+    """
+    Memoized topic lookup; the curriculum is static between reloads, so each
+    (grade, subject, topic) is resolved once per curriculum_mtime.
+    Results are shared between callers and must not be mutated.
+    """
+    return _lookup_curriculum_objectives(
+        _load_curriculum(CURRICULUM_PATH, curriculum_mtime), grade, subject, topic
+    )
+
 
 def get_curriculum_objectives(grade: str, subject: str, topic: str) -> Dict[str, Union[List[str], str]]:
     """Fetch curriculum objectives for a specific grade, subject, and topic from the local map."""
     try:
-        grade = normalize_grade(grade)
-        subject = normalize_subject(subject)
-        
-        curriculum_path = Path(__file__).resolve().parents[1] / "data" / "curriculum_map.json"
-        
-        if not curriculum_path.exists():
+        if not CURRICULUM_PATH.exists():
             return {"error": "Curriculum map file not found."}
             
-        with open(curriculum_path, 'r', encoding='utf-8') as f:
-            curriculum_data = json.load(f)
-            
-        if grade not in curriculum_data:
-            return {"error": f"Grade '{grade}' not found. Available: {list(curriculum_data.keys())}"}
-            
-        grade_data = curriculum_data[grade]
+        return _memoized_objectives(grade, subject, topic, CURRICULUM_PATH.stat().st_mtime)
         
-        if subject not in grade_data:
-            return {"error": f"Subject '{subject}' not found in {grade}. Available: {list(grade_data.keys())}"}
-            
-        subject_data = grade_data[subject]
-        
-        # Recursive search function (kept simplified)
-        def search_topic_recursive(data: Union[Dict, List], search_topic: str) -> Optional[Dict]:
-            search_topic_lower = search_topic.lower().strip()
+    except Exception as e:
+        # Catch file system or JSON errors
+        return {"error": f"Error retrieving curriculum objectives: {str(e)}"}
+
+
+async def aget_curriculum_objectives(grade: str, subject: str, topic: str) -> Dict[str, Union[List[str], str]]:
+    """Async variant of get_curriculum_objectives; loading or reloading the curriculum runs in a worker thread."""
+    try:
+        if not CURRICULUM_PATH.exists():
+            return {"error": "Curriculum map file not found."}
             
-            if isinstance(data, dict):
-                if "TOPIC NAME" in data:
-                    topic_name = data["TOPIC NAME"].lower().strip()
-                    if search_topic_lower in topic_name or topic_name in search_topic_lower:
-                        return data
-
-                for value in data.values():
-                    result = search_topic_recursive(value, search_topic)
-                    if result:
-                        return result
-                            
-            elif isinstance(data, list):
-                for item in data:
-                    result = search_topic_recursive(item, search_topic)
-                    if result:
-                        return result
-                            
-            return None
-        
-        topic_data = search_topic_recursive(subject_data, topic)
-        
-        if not topic_data:
-            return {"error": f"Topic '{topic}' not found in {subject} for {grade}"}
-        
-        # Extract and map the curriculum information
-        result = {
-            "objectives": topic_data.get("PERFORMANCE OBJECTIVES", []),
-            "content": topic_data.get("CONTENT", []),
-            "teacher_activities": topic_data.get("TEACHER ACTIVITIES", []),
-            "student_activities": topic_data.get("STUDENTS ACTIVITIES", topic_data.get("PUPILS ACTIVITIES", [])),
-            "resources": topic_data.get("TEACHING AND LEARNING RESOURCES", []),
-            "topic_name": topic_data.get("TOPIC NAME", topic)
-        }
-        return result
+        mtime = CURRICULUM_PATH.stat().st_mtime
+        await _ensure_curriculum_loaded(mtime)
+        return _memoized_objectives(grade, subject, topic, mtime)
         
     except Exception as e:
         # Catch file system or JSON errors
@@ -183,82 +383,293 @@ def get_curriculum_objectives(grade: str, subject: str, topic: str) -> Dict[str,
 
 # --- LLM Call Function ---
 
-def _call_llm(prompt: str, max_tokens: int = 1200, temperature: float = 0.15) -> str:
-    """Directly call the Gemini API using the global client."""
-    print(f"🔥 _call_llm started with max_tokens={max_tokens}, temperature={temperature}")
+class LessonActivity(BaseModel):
+    name: str
+    description: str
+    duration: str
+
+
+class LowDataVersion(BaseModel):
+    objectives: List[str]
+    activities: List[LessonActivity]
+
+
+class LessonPlanSchema(BaseModel):
+    """Lesson plan structure Gemini is constrained to return (mirrors the keys listed in PROMPT_PREAMBLE)."""
+    title: str
+    objectives: List[str]
+    learning_outcomes: List[str]
+    introduction: str
+    activities: List[LessonActivity]
+    differentiation: List[str]
+    materials: List[str]
+    assessment: List[str]
+    classroom_management: List[str]
+    extension: str
+    low_data_version: LowDataVersion
+    notes: str
+
+
+class LessonBatchSchema(BaseModel):
+    """Response structure for a coalesced call: one lesson plan per ### LESSON section, in order."""
+    lessons: List[LessonPlanSchema]
+
+
+def _generation_config(
+    max_tokens: int,
+    temperature: float,
+    schema: type = LessonPlanSchema,
+) -> types.GenerateContentConfig:
+    """Build the generation config shared by the blocking, batched and streaming calls."""
+    return types.GenerateContentConfig(
+        temperature=temperature,
+        maxOutputTokens=max_tokens,
+        responseMimeType="application/json",
+        responseSchema=schema,
+        systemInstruction=PROMPT_PREAMBLE
+    )
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """Transient Gemini failures worth retrying: 5xx, 429 rate limiting and network errors."""
+    if isinstance(exc, errors.ServerError):
+        return True
+    if isinstance(exc, errors.ClientError):
+        return exc.code == 429
+    return isinstance(exc, httpx.TransportError)
+
+
+# Shared by the blocking and streaming calls
+_retry_transient = retry(
+    stop=stop_after_attempt(4),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception(_is_retryable),
+    reraise=True,
+)
+
+
+@_retry_transient
+async def _generate_content_async(client: genai.Client, prompt: str, config: types.GenerateContentConfig):
+    """Issue generate_content, retrying transient failures with jittered exponential backoff."""
+    return await client.aio.models.generate_content(
+        model=LLM_MODEL, 
+        contents=prompt,
+        config=config
+    )
+
+
+@_retry_transient
+async def _open_content_stream(client: genai.Client, prompt: str, config: types.GenerateContentConfig):
+    """
+    Open generate_content_stream and read its first chunk, retrying transient failures.
+
+    Failures usually surface on the first read rather than on the open call, and
+    nothing has reached the client yet, so both are covered by the retry.
+    Returns (first chunk or None, stream).
+    """
+    stream = await client.aio.models.generate_content_stream(
+        model=LLM_MODEL,
+        contents=prompt,
+        config=config
+    )
+    return await anext(stream, None), stream
+
+
+def _hit_token_limit(response) -> bool:
+    """True when Gemini stopped because the output reached maxOutputTokens (the JSON is then cut off)."""
+    candidates = getattr(response, "candidates", None)
+    return bool(candidates) and candidates[0].finish_reason == types.FinishReason.MAX_TOKENS
+
+
+def _token_limit_error(max_tokens: int, text: str) -> Dict:
+    """Error result for a plan that ran past its output token cap."""
+    return {
+        "error": f"Lesson plan was cut off at the {max_tokens}-token output limit. "
+                 f"Try the full output mode or a larger max_tokens.",
+        "raw": text,
+    }
+
+
+async def _call_llm_async(prompt: str, max_tokens: int = 1200, temperature: float = 0.15, schema: type = LessonPlanSchema) -> str:
+    """Call the Gemini API through the client's async interface so the event loop stays free."""
     try:           
         # Ensure client is initialized
-        print(f"🔑 Ensuring client is initialized...")
         client = _ensure_client()
-        print(f"✅ Client initialized successfully")
-        
-        # Count tokens for safety (optional, but good practice to keep)
-        print(f"🔢 Counting tokens for model: '{LLM_MODEL}' (type: {type(LLM_MODEL)})")
-        print(f"🔍 Model name length: {len(LLM_MODEL)} chars")
-        print(f"🔍 Model name repr: {repr(LLM_MODEL)}")
-        token_response = client.models.count_tokens(
-            model=LLM_MODEL, 
-            contents=prompt
-        )
-        prompt_tokens = token_response.total_tokens
         
-        # NOTE: Using a simple print here to log the token count for performance monitoring
-        print(f"📊 Prompt token count for {LLM_MODEL}: {prompt_tokens}")
-
+        # Local ~4 chars/token estimate; a count_tokens call would cost a full extra round-trip
+        prompt_tokens = len(prompt) // 4
         if prompt_tokens > 500000: 
-            print(f"❌ Prompt too large: {prompt_tokens} tokens")
-            raise RuntimeError(f"Input too large: {prompt_tokens} tokens (Max 500k advisory limit).")
-
-        print(f"🚀 Making API call to generate content...")
-        print(f"🎛️ Config: temperature={temperature}, maxOutputTokens={max_tokens}")
-        response = client.models.generate_content(
-            model=LLM_MODEL, 
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=temperature,
-                maxOutputTokens=max_tokens,
-                responseMimeType="application/json"
-            )
-        )
-        print(f"✅ API call completed successfully")
+            raise RuntimeError(f"Input too large: ~{prompt_tokens} tokens (Max 500k advisory limit).")
+
+        logger.debug("🚀 Calling Gemini: temperature=%s, maxOutputTokens=%s", temperature, max_tokens)
+        config = _generation_config(max_tokens, temperature, schema)
+        response = await _generate_content_async(client, prompt, config)
         
+        usage = getattr(response, "usage_metadata", None)
+        if usage:
+            logger.info(
+                "📊 Token usage for %s: prompt=%s, output=%s",
+                LLM_MODEL, usage.prompt_token_count, usage.candidates_token_count,
+            )
         if response and response.text:
-            print(f"📝 Response received, length: {len(response.text)} chars")
-            print(f"🔍 Response preview: {response.text[:200]}...")
+            logger.debug("📝 Response received, length: %d chars", len(response.text))
+            if _hit_token_limit(response):
+                logger.warning("✂️ Gemini output hit maxOutputTokens=%s", max_tokens)
+                return orjson.dumps(_token_limit_error(max_tokens, response.text)).decode()
             return response.text.strip()
         else:
             # Handle cases where the API call succeeds but the model returns no text (e.g., blocked content)
-            print(f"⚠️ Empty response from Gemini")
-            print(f"🔍 Full response object: {response}")
-            return json.dumps({"error": "Gemini returned empty response.", 
-                               "feedback": str(getattr(response, 'prompt_feedback', 'None'))})
+            logger.warning("⚠️ Empty response from Gemini: %s", response)
+            return orjson.dumps({"error": "Gemini returned empty response.", 
+                                 "feedback": str(getattr(response, 'prompt_feedback', 'None'))}).decode()
             
     except Exception as e:
         # Raise generic RuntimeError to be caught by generate_lesson_plan
-        print(f"💥 Exception in _call_llm: {type(e).__name__}: {str(e)}")
-        import traceback
-        print(f"📍 Full traceback: {traceback.format_exc()}")
+        logger.exception("💥 Gemini call failed: %s: %s", type(e).__name__, e)
         raise RuntimeError(f"Gemini API call failed: {str(e)}")
 
 
-# --- Prompt Template (Unchanged) ---
+class _BatchItem(NamedTuple):
+    prompt: str
+    max_tokens: int
+    future: asyncio.Future
 
-PROMPT_TEMPLATE = """
-You are a curriculum expert and instructional designer experienced in creating simple, practical lesson structures for low-resource learning environments.
 
-Your job is to produce one clear, structured lesson plan JSON for the details below. Be concise, avoid commentary, and return **only valid JSON**.
+def _ensure_batch_worker() -> asyncio.Queue:
+    """Return the batch queue, (re)starting its worker task on the running loop if needed."""
+    global _batch_queue, _batch_worker
+    if _batch_worker is None or _batch_worker.done() or _batch_worker.get_loop() is not asyncio.get_running_loop():
+        _batch_queue = asyncio.Queue()
+        _batch_worker = asyncio.create_task(_run_batches(_batch_queue))
+    return _batch_queue
 
-CONTEXT (Curriculum objectives found):
-{curriculum_context}
 
-INPUT DETAILS:
-- Level: {grade}
-- Subject: {subject}
-- Topic: {topic}
-- Language: {language}
-- Context summary: {classroom_context}
-- Available materials/resources: {teacher_input}
-- Output mode: {output_mode}
+async def _run_batches(queue: asyncio.Queue) -> None:
+    """
+    Drain the queue in groups of up to BATCH_MAX, waiting at most BATCH_WINDOW_MS for a group to fill.
+
+    A group is also closed once the next item's max_tokens would push its
+    total past MODEL_MAX_OUTPUT_TOKENS; that item starts the next group.
+    """
+    loop = asyncio.get_running_loop()
+    carry = None
+    while True:
+        first = carry if carry is not None else await queue.get()
+        carry = None
+        batch = [first]
+        batch_tokens = first.max_tokens
+        deadline = loop.time() + BATCH_WINDOW_MS / 1000
+        while len(batch) < BATCH_MAX:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            if batch_tokens + item.max_tokens > MODEL_MAX_OUTPUT_TOKENS:
+                carry = item
+                break
+            batch.append(item)
+            batch_tokens += item.max_tokens
+        # Run the call in its own task so the next group can start filling meanwhile
+        task = asyncio.create_task(_call_llm_batch(batch))
+        _batch_tasks.add(task)
+        task.add_done_callback(_batch_tasks.discard)
+
+
+async def _call_llm_combined(batch: List[_BatchItem]) -> List[Dict]:
+    """Send a group of prompts as one Gemini call and return the lesson plans it produced, in order."""
+    logger.info("📦 Coalescing %d lesson requests into one Gemini call", len(batch))
+    sections = "\n\n".join(
+        f"### LESSON {i}\n{item.prompt}" for i, item in enumerate(batch, start=1)
+    )
+    prompt = (
+        f"This request covers {len(batch)} independent lessons, one per ### LESSON section below. "
+        f"Write one lesson plan per section, each following the lesson plan format in your instructions, "
+        f'and return them together as JSON of the form {{"lessons": [...]}} in the same order.\n\n'
+        f"{sections}"
+    )
+    text = await _call_llm_async(
+        prompt,
+        max_tokens=min(sum(item.max_tokens for item in batch), MODEL_MAX_OUTPUT_TOKENS),
+        schema=LessonBatchSchema,
+    )
+    lessons = orjson.loads(text).get("lessons")
+    return lessons if isinstance(lessons, list) else []
+
+
+async def _call_llm_batch(batch: List[_BatchItem]) -> None:
+    """
+    Resolve each item's future with its lesson JSON.
+
+    Groups of two or more go out as one combined call. If that call fails,
+    or returns fewer lessons than requested, the affected lessons are sent
+    as individual calls, so one bad batch doesn't fail every request in it.
+    """
+    global _llm_calls_in_flight
+    _llm_calls_in_flight += 1
+    try:
+        texts: List[Union[str, BaseException, None]] = [None] * len(batch)
+        if len(batch) > 1:
+            try:
+                lessons = await _call_llm_combined(batch)
+            except Exception as e:
+                logger.warning("⚠️ Coalesced call for %d lessons failed, sending them one by one: %s", len(batch), e)
+            else:
+                for i, lesson in enumerate(lessons[:len(batch)]):
+                    texts[i] = orjson.dumps(lesson).decode()
+
+        missing = [i for i, text in enumerate(texts) if text is None]
+        results = await asyncio.gather(
+            *(_call_llm_async(batch[i].prompt, max_tokens=batch[i].max_tokens) for i in missing),
+            return_exceptions=True,
+        )
+        for i, result in zip(missing, results):
+            texts[i] = result
+
+        for item, text in zip(batch, texts):
+            if item.future.done():
+                continue
+            if isinstance(text, BaseException):
+                item.future.set_exception(text)
+            else:
+                item.future.set_result(text)
+    finally:
+        _llm_calls_in_flight -= 1
+        # Don't leave waiters hanging if this task itself was cancelled
+        for item in batch:
+            if not item.future.done():
+                item.future.cancel()
+
+
+async def _complete(prompt: str, max_tokens: int) -> str:
+    """
+    Return Gemini's response text for one lesson prompt.
+
+    When no other call is running the prompt goes straight to Gemini. Under
+    load it joins the batch queue so concurrent lessons share a single call,
+    which keeps the service under Gemini's requests-per-minute limit.
+    """
+    global _llm_calls_in_flight
+    if _llm_calls_in_flight == 0 and (_batch_queue is None or _batch_queue.empty()):
+        _llm_calls_in_flight += 1
+        try:
+            return await _call_llm_async(prompt, max_tokens=max_tokens, temperature=0.15)
+        finally:
+            _llm_calls_in_flight -= 1
+    future = asyncio.get_running_loop().create_future()
+    _ensure_batch_worker().put_nowait(_BatchItem(prompt, max_tokens, future))
+    return await future
+
+
+# --- Prompt Templates ---
+
+# Static instructions, identical for every request, sent as the system instruction
+PROMPT_PREAMBLE = """
+You are a curriculum expert and instructional designer experienced in creating simple, practical lesson structures for low-resource learning environments.
+
+Your job is to produce one clear, structured lesson plan JSON for the details provided. Be concise, avoid commentary, and return **only valid JSON**.
 
 REQUIREMENTS:
 1) Return only JSON with these exact keys:
@@ -277,147 +688,559 @@ REQUIREMENTS:
 2) Write short, functional sentences suitable for local learning contexts.
 3) Avoid any reference to personal, medical, political, or sensitive issues.
 4) Focus on task-based, practical activities that use common, low-cost materials.
-5) If {output_mode} == "short", limit the plan to minimal elements (1–2 objectives).
+5) If the output mode is "short", limit the plan to minimal elements (1–2 objectives).
 6) Ensure the plan is self-contained, neutral in tone, and instructional.
 7) Use simple English and context-neutral examples (e.g., “use local objects,” “draw on board”).
 8) Do not include markdown, explanations, or extra text—JSON only.
-9) CRITICAL: Start your response immediately with {{ and end with }}. No other text before or after.
+9) CRITICAL: Start your response immediately with { and end with }. No other text before or after.
+"""
+
+# Per-request details, formatted for every call
+PROMPT_DYNAMIC = """
+CONTEXT (Curriculum objectives found):
+{curriculum_context}
+
+INPUT DETAILS:
+- Level: {grade}
+- Subject: {subject}
+- Topic: {topic}
+- Language: {language}
+- Context summary: {classroom_context}
+- Available materials/resources: {teacher_input}
+- Output mode: {output_mode}
 
 END PROMPT.
 """
 
 
+def _escape_braces(value: str) -> str:
+    """Escape braces so a value baked into a template survives a later str.format()."""
+    return value.replace("{", "{{").replace("}", "}}")
+
+
+@lru_cache(maxsize=32)
+def _specialized_template(language: str, classroom_context: str, output_mode: str) -> str:
+    """
+    Pre-fill the slots of PROMPT_DYNAMIC that only take a handful of values.
+
+    The returned template still expects curriculum_context, grade, subject,
+    topic and teacher_input.
+    """
+    return (
+        PROMPT_DYNAMIC
+        .replace("{language}", _escape_braces(language))
+        .replace("{classroom_context}", _escape_braces(classroom_context))
+        .replace("{output_mode}", _escape_braces(output_mode))
+    )
+
+
 # --- Main Logic ---
 
-def generate_lesson_plan(
-    subject: str,
-    grade: str,
-    topic: str,
-    curriculum_context: Optional[str] = None,
-    teacher_input: Optional[str] = None,
-    language: str = "English",
-    classroom_context: str = "rural",
-    output_mode: str = "full",
-) -> Dict:
+def _resolve_max_tokens(output_mode: str, max_tokens: Optional[int]) -> int:
+    """Use the caller's output cap if given, otherwise the default for the output mode."""
+    if max_tokens is not None:
+        return max_tokens
+    return SHORT_MAX_OUTPUT_TOKENS if output_mode == "short" else FULL_MAX_OUTPUT_TOKENS
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
     """
-    Main entry point for the backend. Generates a lesson plan using Gemini.
+    Trim text to roughly max_tokens, using the ~4 characters per token estimate.
+
+    Cuts on the last '; ' separator so list items stay whole, unless that
+    would throw away more than half of the budget.
+    """
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind('; ', 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars] + " …"
+
+
+async def _warm_curriculum(curriculum_context: Optional[str]) -> None:
+    """Load (or reload) the curriculum off the event loop before the sync prompt build reads it."""
+    if curriculum_context is None:
+        mtime = _curriculum_mtime()
+        if mtime is not None:
+            await _ensure_curriculum_loaded(mtime)
+
+
+def _format_curriculum_context(grade: str, subject: str, topic: str, curriculum_mtime: Optional[float]) -> str:
+    """Format the curriculum objectives for a topic into the prompt's context string."""
+    try:
+        return _memoized_curriculum_context(grade, subject, topic, curriculum_mtime)
+    except LookupError as e:
+        # If curriculum retrieval failed, use the error message as context
+        logger.warning("❌ Curriculum error: %s", e)
+        return f"(Curriculum error: {e})"
+
+
+@lru_cache(maxsize=4096)
+def _memoized_curriculum_context(grade: str, subject: str, topic: str, curriculum_mtime: Optional[float]) -> str:
+    """
+    Memoized body of _format_curriculum_context.
+
+    Pure for a given curriculum file, so it is memoized; curriculum_mtime is
+    part of the key so an updated map is picked up. Failed lookups raise
+    LookupError instead of returning, so they are never memoized.
     """
+    logger.debug("🔍 Fetching curriculum objectives for: %s -> %s -> %s", grade, subject, topic)
+    curriculum_objectives = get_curriculum_objectives(grade, subject, topic)
     
-    print(f"🚀 LESSON PLAN GENERATION STARTED")
-    print(f"📝 Input params: grade={grade}, subject={subject}, topic={topic}")
-    print(f"🎯 Teacher input: {teacher_input}")
-    print(f"🌍 Language: {language}, Context: {classroom_context}, Mode: {output_mode}")
+    if "error" in curriculum_objectives:
+        raise LookupError(curriculum_objectives.get('error', 'unknown error'))
+
+    context_parts = []
     
+    if curriculum_objectives.get("topic_name"):
+        context_parts.append(f"Topic: {curriculum_objectives['topic_name']}")
+        
+    if curriculum_objectives.get("objectives"):
+        objectives_str = _truncate_to_tokens('; '.join(curriculum_objectives['objectives']), OBJECTIVES_TOKEN_BUDGET)
+        context_parts.append(f"Performance Objectives: {objectives_str}")
+        
+    if curriculum_objectives.get("content"):
+        content_str = _truncate_to_tokens('; '.join(curriculum_objectives['content']), CONTENT_TOKEN_BUDGET)
+        context_parts.append(f"Content: {content_str}")
+        
+    if curriculum_objectives.get("teacher_activities"):
+        activities_str = _truncate_to_tokens('; '.join(curriculum_objectives['teacher_activities']), ACTIVITIES_TOKEN_BUDGET)
+        context_parts.append(f"Teacher Activities: {activities_str}")
+        
+    curriculum_context = " | ".join(context_parts)
+    logger.debug("📖 Curriculum context built: %d chars", len(curriculum_context))
+    return curriculum_context
+
+
+def _prepare_prompt(
+    subject: str,
+    grade: str,
+    topic: str,
+    curriculum_context: Optional[str],
+    teacher_input: Optional[str],
+    language: str,
+    classroom_context: str,
+    output_mode: str,
+) -> str:
+    """Resolve the curriculum context and fill in the prompt template."""
     # 1) Get curriculum context
-    print(f"📚 Getting curriculum context...")
     if curriculum_context is None:
-        print(f"🔍 Fetching curriculum objectives for: {grade} -> {subject} -> {topic}")
-        curriculum_objectives = get_curriculum_objectives(grade, subject, topic)
-        print(f"📋 Curriculum objectives result: {type(curriculum_objectives)}")
-        
-        if "error" not in curriculum_objectives:
-            print(f"✅ Curriculum objectives found successfully")
-            # Format the curriculum context from the retrieved data
-            context_parts = []
-            
-            if curriculum_objectives.get("topic_name"):
-                context_parts.append(f"Topic: {curriculum_objectives['topic_name']}")
-                
-            if curriculum_objectives.get("objectives"):
-                context_parts.append(f"Performance Objectives: {'; '.join(curriculum_objectives['objectives'])}")
-                
-            if curriculum_objectives.get("content"):
-                content_str = '; '.join(curriculum_objectives['content'])
-                if len(content_str) > 500:  # Truncate content if too long
-                    content_str = content_str[:497] + "..."
-                context_parts.append(f"Content: {content_str}")
-                
-            if curriculum_objectives.get("teacher_activities"):
-                activities_str = '; '.join(curriculum_objectives['teacher_activities'])
-                if len(activities_str) > 300:  # Truncate activities if too long
-                    activities_str = activities_str[:297] + "..."
-                context_parts.append(f"Teacher Activities: {activities_str}")
-                
-            curriculum_context = " | ".join(context_parts)
-            print(f"📖 Curriculum context built: {len(curriculum_context)} chars")
-        else:
-            # If curriculum retrieval failed, use the error message as context
-            error_msg = curriculum_objectives.get('error', 'unknown error')
-            curriculum_context = f"(Curriculum error: {error_msg})"
-            print(f"❌ Curriculum error: {error_msg}")
-            print(f"🔄 Using error context: {curriculum_context}")
+        curriculum_context = _format_curriculum_context(grade, subject, topic, _curriculum_mtime())
     
     # Sanitize curriculum_context length - hard cap to prevent API errors
-    print(f"🧹 Sanitizing curriculum context...")
     if curriculum_context:
         curriculum_context = curriculum_context.strip()
         original_length = len(curriculum_context)
-        if len(curriculum_context) > 4000:
-            curriculum_context = curriculum_context[:3900] + " ... [truncated]"
-            print(f"✂️ Truncated context from {original_length} to {len(curriculum_context)} chars")
+        curriculum_context = _truncate_to_tokens(curriculum_context, CONTEXT_TOKEN_BUDGET)
+        if len(curriculum_context) < original_length:
+            logger.debug("✂️ Truncated context from %d to %d chars", original_length, len(curriculum_context))
         else:
-            print(f"📏 Context length OK: {len(curriculum_context)} chars")
+            logger.debug("📏 Context length OK: %d chars", len(curriculum_context))
     else:
         curriculum_context = "(No curriculum context available)"
-        print(f"⚠️ No curriculum context available, using default")
+        logger.warning("⚠️ No curriculum context available, using default")
         
     # 2) Build Prompt
-    print(f"🔨 Building prompt...")
-    prompt = PROMPT_TEMPLATE.format(
+    template = _specialized_template(
+        language, classroom_context, "short" if output_mode == "short" else "full"
+    )
+    prompt = template.format(
         curriculum_context=curriculum_context,
         grade=grade,
         subject=subject,
         topic=topic,
-        language=language,
-        classroom_context=classroom_context,
         teacher_input=teacher_input or "None provided",
-        output_mode=("short" if output_mode == "short" else "full"),
     )
     
-    print(f"📝 Prompt built successfully, length: {len(prompt)} chars")
+    logger.debug("📝 Prompt built, length: %d chars", len(prompt))
+    return prompt
+
+
+def _parse_llm_response(llm_response_text: str) -> Dict:
+    """Parse the LLM output. JSON mode + response_schema means anything else is a truncated or failed response."""
+    try:
+        parsed = orjson.loads(llm_response_text)
+    except Exception as json_error:
+        logger.error("❌ JSON parsing failed: %s", json_error)
+        logger.debug("📄 Raw LLM response: %s ... %s", llm_response_text[:500], llm_response_text[-200:])
+        parsed = {"error": "LLM returned invalid JSON", "raw": llm_response_text}
+    return parsed
+
+
+def _sse_frame(payload: Dict, event: Optional[str] = None) -> str:
+    """Encode a payload as a single Server-Sent Events frame."""
+    frame = f"data: {orjson.dumps(payload).decode()}\n\n"
+    return f"event: {event}\n{frame}" if event else frame
+
+
+class _SectionScanner:
+    """
+    Incrementally pick completed top-level members out of a JSON object as it streams in.
+
+    Tracks string/escape state and bracket depth across chunks; whenever a
+    member at depth 1 is closed by ',' or the final '}', it is parsed on its
+    own and returned as a (key, value) pair.
+    """
+
+    def __init__(self) -> None:
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        self._text += chunk
+        text = self._text
+        completed = []
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            if ch == '"':
+                self._in_string = True
+                if self._depth == 1 and self._member_start is None:
+                    self._member_start = i
+            elif ch == "{" or ch == "[":
+                self._depth += 1
+            elif ch == "}" or ch == "]":
+                if self._depth == 1:
+                    self._finish_member(i, completed)
+                self._depth -= 1
+            elif ch == "," and self._depth == 1:
+                self._finish_member(i, completed)
+        self._pos = len(text)
+        return completed
+
+    def _finish_member(self, end: int, completed: List[Tuple[str, object]]) -> None:
+        if self._member_start is None:
+            return
+        member = self._text[self._member_start:end]
+        self._member_start = None
+        try:
+            completed.extend(orjson.loads("{" + member + "}").items())
+        except orjson.JSONDecodeError:
+            pass
+
+
+def _request_key(
+    subject: str,
+    grade: str,
+    topic: str,
+    curriculum_context: Optional[str],
+    teacher_input: Optional[str],
+    language: str,
+    classroom_context: str,
+    output_mode: str,
+    max_tokens: Optional[int],
+) -> bytes:
+    """Stable digest identifying requests that would produce the same lesson plan."""
+    # Without an explicit context it is looked up in the curriculum map, so the
+    # map's version decides the plan; plans from an older map stop matching
+    if curriculum_context is None:
+        context_source = f"map:{_curriculum_mtime()}"
+    else:
+        context_source = f"context:{curriculum_context}"
+    raw = "|".join((
+        normalize_grade(grade),
+        normalize_subject(subject),
+        topic.lower().strip(),
+        context_source,
+        teacher_input or "",
+        language,
+        classroom_context,
+        output_mode,
+        str(max_tokens),
+    ))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest()
+
+
+async def _cached_or_joined(cache_key: bytes, grade: str, subject: str, topic: str) -> Optional[Dict]:
+    """
+    Return the cached plan for cache_key, or the result of an identical generation already running.
+
+    Returns None when the caller should run the generation itself; it must
+    register its own _inflight future before its next await.
+    """
+    while True:
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("⚡ Serving lesson plan from cache")
+            return {"from_cache": True, "result": cached}
+
+        pending = _inflight.get(cache_key)
+        if pending is None:
+            return None
+        logger.info("🔗 Joining in-flight generation for %s -> %s -> %s", grade, subject, topic)
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise  # This caller was cancelled, not the generation it joined
+            # The leading request was cancelled; generate (or join a newer leader) instead
+            logger.info("🔁 In-flight generation was cancelled, retrying for %s -> %s -> %s", grade, subject, topic)
+
+
+async def generate_lesson_plan(
+    subject: str,
+    grade: str,
+    topic: str,
+    curriculum_context: Optional[str] = None,
+    teacher_input: Optional[str] = None,
+    language: str = "English",
+    classroom_context: str = "rural",
+    output_mode: str = "full",
+    max_tokens: Optional[int] = None,
+) -> Dict:
+    """
+    Main entry point for the backend. Generates a lesson plan using Gemini.
+
+    max_tokens caps the output length; by default short plans get a smaller
+    cap than full ones, which makes them proportionally faster. Identical
+    requests that arrive while a generation is running wait for that
+    generation instead of issuing their own Gemini call.
+    """
+    
+    logger.info("🚀 Generating lesson plan: grade=%s, subject=%s, topic=%s", grade, subject, topic)
+    logger.debug(
+        "🎯 Teacher input: %s | Language: %s, Context: %s, Mode: %s",
+        teacher_input, language, classroom_context, output_mode,
+    )
+    
+    cache_key = _request_key(
+        subject, grade, topic, curriculum_context, teacher_input,
+        language, classroom_context, output_mode, max_tokens,
+    )
+    joined = await _cached_or_joined(cache_key, grade, subject, topic)
+    if joined is not None:
+        return joined
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[cache_key] = future
+    try:
+        result = await _generate_lesson_plan(
+            cache_key, subject, grade, topic, curriculum_context, teacher_input,
+            language, classroom_context, output_mode, max_tokens,
+        )
+    except Exception as e:
+        future.set_exception(e)
+        future.exception()  # Mark retrieved so an un-awaited future doesn't warn
+        raise
+    except BaseException:
+        # Cancellation belongs to this caller only: joiners see a cancelled future and retry
+        future.cancel()
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        if _inflight.get(cache_key) is future:
+            del _inflight[cache_key]
+
+
+async def _generate_lesson_plan(
+    cache_key: bytes,
+    subject: str,
+    grade: str,
+    topic: str,
+    curriculum_context: Optional[str],
+    teacher_input: Optional[str],
+    language: str,
+    classroom_context: str,
+    output_mode: str,
+    max_tokens: Optional[int],
+) -> Dict:
+    """Generate and cache a single lesson plan (the uncached path of generate_lesson_plan)."""
+    # 1-2) Resolve curriculum context and build the prompt
+    await _warm_curriculum(curriculum_context)
+    prompt = _prepare_prompt(
+        subject, grade, topic, curriculum_context, teacher_input,
+        language, classroom_context, output_mode,
+    )
     
     # 3) Call the LLM
-    print(f"🤖 Calling LLM...")
     try:
-        llm_response_text = _call_llm(prompt, max_tokens=1200, temperature=0.15)
-        print(f"✅ LLM call successful, response length: {len(llm_response_text)} chars")
+        llm_response_text = await _complete(prompt, _resolve_max_tokens(output_mode, max_tokens))
     except RuntimeError as e:
         # Catch and structure the raised API error for the FastAPI endpoint
-        print(f"❌ LLM call failed with RuntimeError: {str(e)}")
+        logger.error("❌ LLM call failed: %s", e)
         return {"from_cache": False, "result": {"error": str(e)}}
     except Exception as e:
-        print(f"💥 LLM call failed with unexpected error: {str(e)}")
+        logger.exception("💥 LLM call failed with unexpected error: %s", e)
         return {"from_cache": False, "result": {"error": f"Unexpected error: {str(e)}"}}
 
     # 4) Attempt to parse as JSON
-    print(f"🔧 Parsing JSON response...")
-    parsed = None
-    try:
-        parsed = json.loads(llm_response_text)
-        print(f"✅ JSON parsing successful")
-        print(f"📊 Parsed result keys: {list(parsed.keys()) if isinstance(parsed, dict) else 'Not a dict'}")
-    except Exception as json_error:
-        print(f"❌ Initial JSON parsing failed: {str(json_error)}")
-        print(f"🔍 Attempting robust parsing...")
-        # Robust parsing: Try to extract the first JSON object from the text
-        match = re.search(r"(\{[\s\S]*\})", llm_response_text)
-        if match:
-            print(f"🎯 Found JSON pattern in response")
-            try:
-                parsed = json.loads(match.group(1))
-                print(f"✅ Robust JSON parsing successful")
-            except Exception as extract_error:
-                # Parsing failed even after extraction
-                print(f"💥 Robust parsing also failed: {str(extract_error)}")
-                parsed = {"error": "LLM returned invalid JSON (extraction failed)", "raw": llm_response_text}
-        else:
-            # LLM returned non-JSON/non-parseable text
-            print(f"🚫 No JSON pattern found in response")
-            print(f"📄 Raw LLM response (first 500 chars): {llm_response_text[:500]}")
-            print(f"📄 Raw LLM response (last 200 chars): {llm_response_text[-200:]}")
-            parsed = {"error": "LLM did not return JSON format", "raw": llm_response_text}
-
-    # 5) Return the result
-    print(f"🎉 Lesson plan generation completed")
-    print(f"📤 Returning result with keys: {list(parsed.keys()) if isinstance(parsed, dict) else 'Not a dict'}")
+    parsed = _parse_llm_response(llm_response_text)
+
+    # 5) Cache successful plans and return the result
+    if isinstance(parsed, dict) and "error" not in parsed:
+        _response_cache[cache_key] = parsed
+    logger.info("🎉 Lesson plan generation completed")
     return {"from_cache": False, "result": parsed}
+
+
+async def stream_lesson_plan(
+    subject: str,
+    grade: str,
+    topic: str,
+    curriculum_context: Optional[str] = None,
+    teacher_input: Optional[str] = None,
+    language: str = "English",
+    classroom_context: str = "rural",
+    output_mode: str = "full",
+    max_tokens: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of generate_lesson_plan that yields Server-Sent Events frames.
+
+    Each text chunk from Gemini is forwarded as it arrives (``data: {"text": ...}``),
+    and every lesson plan key is sent as a ``section`` event as soon as its
+    value is complete, so clients can render the plan progressively. Once the
+    stream closes the accumulated text is parsed and sent as a final ``done``
+    event carrying the lesson plan and token usage, or an ``error`` event.
+
+    Like generate_lesson_plan, a cached plan or an identical generation that
+    is already running (streamed or not) is sent as a single ``done`` event,
+    and a running stream is joined by identical requests on either path.
+    """
+    logger.info("🌊 Streaming lesson plan: grade=%s, subject=%s, topic=%s", grade, subject, topic)
+    cache_key = _request_key(
+        subject, grade, topic, curriculum_context, teacher_input,
+        language, classroom_context, output_mode, max_tokens,
+    )
+    joined = await _cached_or_joined(cache_key, grade, subject, topic)
+    if joined is not None:
+        yield _sse_frame({**joined, "usage": None}, event="done")
+        return
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[cache_key] = future
+    try:
+        async for frame in _stream_lesson_plan(
+            cache_key, future, subject, grade, topic, curriculum_context, teacher_input,
+            language, classroom_context, output_mode, max_tokens,
+        ):
+            yield frame
+    finally:
+        if not future.done():
+            # Client went away mid-stream: joiners see a cancelled future and retry
+            future.cancel()
+        if _inflight.get(cache_key) is future:
+            del _inflight[cache_key]
+
+
+async def _stream_lesson_plan(
+    cache_key: bytes,
+    future: asyncio.Future,
+    subject: str,
+    grade: str,
+    topic: str,
+    curriculum_context: Optional[str],
+    teacher_input: Optional[str],
+    language: str,
+    classroom_context: str,
+    output_mode: str,
+    max_tokens: Optional[int],
+) -> AsyncIterator[str]:
+    """
+    Stream and cache a single lesson plan (the uncached path of stream_lesson_plan).
+
+    The outcome is set on future before the final frame goes out, so joined
+    requests don't wait on this client reading it.
+    """
+    await _warm_curriculum(curriculum_context)
+    prompt = _prepare_prompt(
+        subject, grade, topic, curriculum_context, teacher_input,
+        language, classroom_context, output_mode,
+    )
+
+    buffer = []
+    scanner = _SectionScanner()
+    usage = None
+    truncated = False
+    output_tokens = _resolve_max_tokens(output_mode, max_tokens)
+    try:
+        client = _ensure_client()
+        chunk, stream = await _open_content_stream(
+            client, prompt,
+            _generation_config(output_tokens, 0.15)
+        )
+        while chunk is not None:
+            if chunk.text:
+                buffer.append(chunk.text)
+                yield _sse_frame({"text": chunk.text})
+                for key, value in scanner.feed(chunk.text):
+                    yield _sse_frame({"key": key, "value": value}, event="section")
+            # Usage totals and the finish reason are reported on the final chunk
+            if chunk.usage_metadata:
+                usage = chunk.usage_metadata
+            truncated = truncated or _hit_token_limit(chunk)
+            chunk = await anext(stream, None)
+    except Exception as e:
+        logger.exception("💥 Exception while streaming from Gemini: %s: %s", type(e).__name__, e)
+        error = f"Gemini API call failed: {str(e)}"
+        future.set_result({"from_cache": False, "result": {"error": error}})
+        yield _sse_frame({"error": error}, event="error")
+        return
+
+    llm_response_text = "".join(buffer).strip()
+    logger.debug("✅ Stream completed, response length: %d chars", len(llm_response_text))
+    if not llm_response_text:
+        error = "Gemini returned empty response."
+        future.set_result({"from_cache": False, "result": {"error": error}})
+        yield _sse_frame({"error": error}, event="error")
+        return
+
+    if truncated:
+        logger.warning("✂️ Gemini stream hit maxOutputTokens=%s", output_tokens)
+        error = _token_limit_error(output_tokens, llm_response_text)
+        future.set_result({"from_cache": False, "result": error})
+        yield _sse_frame(error, event="error")
+        return
+
+    parsed = _parse_llm_response(llm_response_text)
+    if isinstance(parsed, dict) and "error" not in parsed:
+        _response_cache[cache_key] = parsed
+    future.set_result({"from_cache": False, "result": parsed})
+    yield _sse_frame(
+        {
+            "from_cache": False,
+            "result": parsed,
+            "usage": {
+                "input_tokens": getattr(usage, "prompt_token_count", None),
+                "output_tokens": getattr(usage, "candidates_token_count", None),
+            },
+        },
+        event="done",
+    )
+
+
+# --- Startup & Health ---
+
+def warm_up() -> None:
+    """Build the Gemini client and load the curriculum indexes ahead of the first request."""
+    try:
+        _ensure_client()
+    except ValueError as e:
+        logger.warning("⚠️ Gemini client not initialized at startup: %s", e)
+    if CURRICULUM_PATH.exists():
+        _curriculum_cache()
+        logger.info("📚 Curriculum cache warmed from %s", CURRICULUM_PATH)
+    else:
+        logger.error("❌ Curriculum map not found at: %s", CURRICULUM_PATH)
+
+
+def cache_status() -> Dict[str, Union[bool, int]]:
+    """Report which in-process caches are warm, for /health."""
+    return {
+        "gemini_client_ready": CLIENT is not None,
+        "curriculum_loaded": _load_curriculum.cache_info().currsize > 0,
+        "cached_lesson_plans": len(_response_cache),
+    }
@@ -1,18 +1,55 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from pathlib import Path
-import json
+from typing import List, Dict, Any, Callable, Optional, Tuple
+import hashlib
+import logging
 import os
-from core.lesson_generator import get_curriculum_objectives, generate_lesson_plan
+import orjson
+from core.lesson_generator import (
+    CURRICULUM_PATH,
+    aget_curriculum_objectives,
+    cache_status,
+    generate_lesson_plan,
+    get_subjects_by_grade,
+    list_grades,
+    list_topics,
+    stream_lesson_plan,
+    warm_up,
+)
 from dotenv import load_dotenv
 load_dotenv()
 
+# LOG_LEVEL=INFO/DEBUG brings back request tracing; production stays quiet at WARNING.
+# An unknown value falls back to WARNING instead of stopping the API from starting.
+_requested_log_level = (os.getenv("LOG_LEVEL") or "WARNING").upper()
+_level_number = logging.getLevelNamesMapping().get(_requested_log_level, logging.NOTSET)
+# Canonical name (WARN -> WARNING, FATAL -> CRITICAL), which uvicorn's log_level also accepts
+LOG_LEVEL = logging.getLevelName(_level_number) if _level_number != logging.NOTSET else "WARNING"
+logging.basicConfig(
+    level=LOG_LEVEL,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("klassiq")
+if _level_number == logging.NOTSET:
+    logger.warning("⚠️ Unknown LOG_LEVEL %r, using %s", _requested_log_level, LOG_LEVEL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Pay the Gemini client and curriculum load costs at boot rather than on the first request."""
+    warm_up()
+    yield
+
 
 app = FastAPI(
     title="KlassIQ API",
     description="KlassIQ is an AI-assisted lesson design API that helps teachers generate curriculum-aligned lesson plans for Nigeria’s 2025 basic education reform.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # orjson serializes the nested lesson plan and curriculum dicts several times faster than stdlib json
+    default_response_class=ORJSONResponse
 )
 
 class LessonRequest(BaseModel):
@@ -21,6 +58,9 @@ class LessonRequest(BaseModel):
     topic: str
     term: str | None = None
     teacher_input: str | None = None
+    language: str = "English"
+    classroom_context: str = "rural"
+    output_mode: str = "full"
     
 class CurriculumRequest(BaseModel):
     grade: str
@@ -28,11 +68,10 @@ class CurriculumRequest(BaseModel):
     topic: str
 
 @app.get("/health")
-def health_check():
+async def health_check():
     """Health check with curriculum data verification."""
     try:
-        curriculum_path = Path(__file__).resolve().parent / "data" / "curriculum_map.json"
-        curriculum_exists = curriculum_path.exists()
+        curriculum_exists = CURRICULUM_PATH.exists()
         
         # Check API key availability
         gemini_api_key_available = bool(os.getenv('GEMINI_API_KEY'))
@@ -41,7 +80,8 @@ def health_check():
             "status": "ok", 
             "message": "KlassIQ backend is running smoothly.",
             "curriculum_map_exists": curriculum_exists,
-            "gemini_api_key_configured": gemini_api_key_available
+            "gemini_api_key_configured": gemini_api_key_available,
+            "caches": cache_status()
         }
         
         if not gemini_api_key_available:
@@ -49,14 +89,13 @@ def health_check():
         
         if curriculum_exists:
             try:
-                with open(curriculum_path, 'r', encoding='utf-8') as f:
-                    curriculum_data = json.load(f)
-                health_info["curriculum_grades"] = len(curriculum_data)
-                health_info["curriculum_subjects"] = sum(len(subjects) for subjects in curriculum_data.values())
+                subjects_by_grade = get_subjects_by_grade()
+                health_info["curriculum_grades"] = len(subjects_by_grade)
+                health_info["curriculum_subjects"] = sum(len(subjects) for subjects in subjects_by_grade.values())
             except Exception as e:
                 health_info["curriculum_load_error"] = str(e)
         else:
-            health_info["curriculum_path"] = str(curriculum_path)
+            health_info["curriculum_path"] = str(CURRICULUM_PATH)
             
         return health_info
     except Exception as e:
@@ -66,88 +105,67 @@ def health_check():
         }
 
 
+# Serialized bodies of the static curriculum listings:
+# route key -> (curriculum object the body was built from, body, ETag)
+_static_bodies: Dict[Tuple[str, ...], Tuple[Any, bytes, str]] = {}
+
+
+def _static_json_response(request: Request, key: Tuple[str, ...], source: Any, payload: Callable[[], Any]) -> Response:
+    """
+    Serve a curriculum listing as pre-serialized bytes with a strong ETag.
+
+    The body is rebuilt only when the curriculum cache hands back a new
+    source object (i.e. the map was reloaded); a matching If-None-Match gets 304.
+    """
+    cached = _static_bodies.get(key)
+    if cached is None or cached[0] is not source:
+        body = orjson.dumps(payload())
+        cached = (source, body, f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"')
+        _static_bodies[key] = cached
+    _, body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=3600"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @app.get("/get-subjects")
-def get_subjects():
+async def get_subjects(request: Request):
     """Get available subjects for each grade level."""
     try:
-        curriculum_path = Path(__file__).resolve().parent / "data" / "curriculum_map.json"
-        
-        if not curriculum_path.exists():
-            raise HTTPException(status_code=500, detail="Curriculum map not found")
-            
-        with open(curriculum_path, 'r', encoding='utf-8') as f:
-            curriculum_data = json.load(f)
-        
-        subjects_by_grade = {}
-        for grade, subjects in curriculum_data.items():
-            subjects_by_grade[grade] = list(subjects.keys())
-            
-        return subjects_by_grade
+        subjects_by_grade = get_subjects_by_grade()
+        return _static_json_response(request, ("get-subjects",), subjects_by_grade, lambda: subjects_by_grade)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading subjects: {str(e)}")
 
 
 @app.get("/curriculum/{grade}/{subject}/topics")
-def get_topics(grade: str, subject: str):
+async def get_topics(request: Request, grade: str, subject: str):
     """Get available topics for a specific grade and subject."""
     try:
-        import json
-        from pathlib import Path
-        
-        curriculum_path = Path(__file__).resolve().parent / "data" / "curriculum_map.json"
-        
-        if not curriculum_path.exists():
-            raise HTTPException(status_code=500, detail="Curriculum map not found")
-            
-        with open(curriculum_path, 'r', encoding='utf-8') as f:
-            curriculum_data = json.load(f)
+        subjects_by_grade = get_subjects_by_grade()
         
-        if grade not in curriculum_data:
-            available_grades = list(curriculum_data.keys())
+        if grade not in subjects_by_grade:
+            available_grades = list_grades()
             raise HTTPException(
                 status_code=404, 
                 detail=f"Grade '{grade}' not found. Available grades: {available_grades}"
             )
             
-        grade_data = curriculum_data[grade]
+        available_subjects = subjects_by_grade[grade]
         
-        if subject not in grade_data:
-            available_subjects = list(grade_data.keys())
+        if subject not in available_subjects:
             raise HTTPException(
                 status_code=404,
                 detail=f"Subject '{subject}' not found in {grade}. Available subjects: {available_subjects}"
             )
             
-        subject_data = grade_data[subject]
-        
-        # Extract all topics from the curriculum structure
-        topics = []
-        
-        def extract_topics_recursive(data):
-            """Recursively extract all topic names from curriculum structure."""
-            if isinstance(data, dict):
-                if "TOPICS" in data and isinstance(data["TOPICS"], list):
-                    for topic_item in data["TOPICS"]:
-                        if isinstance(topic_item, dict) and "TOPIC NAME" in topic_item:
-                            topics.append(topic_item["TOPIC NAME"])
-                            
-                for key, value in data.items():
-                    if isinstance(value, (dict, list)):
-                        extract_topics_recursive(value)
-                        
-            elif isinstance(data, list):
-                for item in data:
-                    if isinstance(item, (dict, list)):
-                        extract_topics_recursive(item)
-        
-        extract_topics_recursive(subject_data)
-        
-        return {
-            "grade": grade,
-            "subject": subject,
-            "topics": sorted(list(set(topics)))  # Remove duplicates and sort
-        }
+        topics = list_topics(grade, subject)
+        return _static_json_response(
+            request, ("topics", grade, subject), topics,
+            lambda: {"grade": grade, "subject": subject, "topics": topics}
+        )
         
     except HTTPException:
         raise
@@ -156,10 +174,10 @@ def get_topics(grade: str, subject: str):
 
 
 @app.post("/curriculum")
-def get_curriculum_topic_data(req: CurriculumRequest):
+async def get_curriculum_topic_data(req: CurriculumRequest):
     """Get curriculum objectives, content, and activities for a specific topic."""
     try:
-        curriculum_data = get_curriculum_objectives(req.grade, req.subject, req.topic)
+        curriculum_data = await aget_curriculum_objectives(req.grade, req.subject, req.topic)
         
         if "error" in curriculum_data:
             raise HTTPException(status_code=404, detail=curriculum_data["error"])
@@ -178,52 +196,38 @@ def get_curriculum_topic_data(req: CurriculumRequest):
 
 
 @app.post("/generate-plan")
-def generate_plan(req: LessonRequest):
+async def generate_plan(req: LessonRequest):
     """Generate a lesson plan based on curriculum objectives."""
-    print(f"\n" + "="*80)
-    print(f"🎯 NEW LESSON PLAN REQUEST RECEIVED")
-    print(f"📋 Request details:")
-    print(f"   - Grade: {req.grade}")
-    print(f"   - Subject: {req.subject}")
-    print(f"   - Topic: {req.topic}")
-    print(f"   - Term: {req.term}")
-    print(f"   - Teacher Input: {req.teacher_input}")
-    print(f"="*80)
+    logger.info("🎯 Lesson plan request: grade=%s, subject=%s, topic=%s, term=%s", req.grade, req.subject, req.topic, req.term)
     
     try:
         # Check if curriculum file exists
-        print(f"📂 Checking curriculum file...")
-        curriculum_path = Path(__file__).resolve().parent / "data" / "curriculum_map.json"
-        if not curriculum_path.exists():
-            print(f"❌ Curriculum map not found at: {curriculum_path}")
+        if not CURRICULUM_PATH.exists():
+            logger.error("❌ Curriculum map not found at: %s", CURRICULUM_PATH)
             raise HTTPException(status_code=500, detail="Curriculum map not found")
-        print(f"✅ Curriculum map found at: {curriculum_path}")
         
         # 1. Generate the lesson plan 
-        print(f"🚀 Starting lesson plan generation...")
         # (The result dict here contains {"from_cache": bool, "result": plan_dict})
-        intermediate_result = generate_lesson_plan(
+        intermediate_result = await generate_lesson_plan(
             subject=req.subject,
             grade=req.grade,
             topic=req.topic,
-            teacher_input=req.teacher_input
+            teacher_input=req.teacher_input,
+            language=req.language,
+            classroom_context=req.classroom_context,
+            output_mode=req.output_mode
         )
-        print(f"📤 Lesson plan generation completed")
-        print(f"🔍 Intermediate result type: {type(intermediate_result)}")
-        print(f"🔍 Intermediate result keys: {list(intermediate_result.keys()) if isinstance(intermediate_result, dict) else 'Not a dict'}")
         
         if not intermediate_result:
-            print(f"❌ No intermediate result returned")
+            logger.error("❌ No intermediate result returned")
             raise HTTPException(status_code=500, detail="Lesson plan generation failed")
             
         # 2. Check for internal errors from LLM/parsing process
         result_data = intermediate_result.get("result", {})
-        print(f"🔍 Result data type: {type(result_data)}")
-        print(f"🔍 Result data keys: {list(result_data.keys()) if isinstance(result_data, dict) else 'Not a dict'}")
         
         if "error" in result_data:
             error_message = result_data["error"]
-            print(f"❌ Error in result data: {error_message}")
+            logger.error("❌ Error in result data: %s", error_message)
             raise HTTPException(status_code=500, detail=f"LLM Processing Error: {error_message}")
             
         # 3. CORRECT RETURN STRUCTURE: Align keys with Streamlit's expectation
@@ -231,71 +235,83 @@ def generate_plan(req: LessonRequest):
             "result": intermediate_result.get("result"), 
             "from_cache": intermediate_result.get("from_cache", False)
         }
-        print(f"✅ Returning successful response")
-        print(f"🔍 Final response keys: {list(final_response.keys())}")
         return final_response
         
-    except HTTPException as he:
-        print(f"🚨 HTTPException caught: {he.status_code} - {he.detail}")
+    except HTTPException:
         raise
     except Exception as e:
-        print(f"💥 Unexpected exception in generate_plan: {type(e).__name__}: {str(e)}")
-        import traceback
-        print(f"📍 Full traceback: {traceback.format_exc()}")
+        logger.exception("💥 Unexpected exception in generate_plan: %s: %s", type(e).__name__, e)
         raise HTTPException(status_code=500, detail=f"Error generating lesson plan: {str(e)}")
 
+@app.post("/generate-plan/stream")
+async def generate_plan_stream(req: LessonRequest):
+    """Stream a lesson plan as Server-Sent Events while Gemini is generating it."""
+    logger.info("🌊 Streaming lesson plan request: %s / %s / %s", req.grade, req.subject, req.topic)
+    return StreamingResponse(
+        stream_lesson_plan(
+            subject=req.subject,
+            grade=req.grade,
+            topic=req.topic,
+            teacher_input=req.teacher_input,
+            language=req.language,
+            classroom_context=req.classroom_context,
+            output_mode=req.output_mode
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Additional utility endpoints
 @app.get("/curriculum/grades")
-def get_grades():
+async def get_grades(request: Request):
     """Get all available grade levels."""
     try:
-        import json
-        from pathlib import Path
-        
-        curriculum_path = Path(__file__).resolve().parent / "data" / "curriculum_map.json"
-        
-        if not curriculum_path.exists():
-            raise HTTPException(status_code=500, detail="Curriculum map not found")
-            
-        with open(curriculum_path, 'r', encoding='utf-8') as f:
-            curriculum_data = json.load(f)
-            
-        return {
-            "grades": list(curriculum_data.keys())
-        }
+        grades = list_grades()
+        return _static_json_response(request, ("grades",), grades, lambda: {"grades": grades})
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading grades: {str(e)}")
 
 
 @app.get("/curriculum/{grade}/subjects")  
-def get_subjects_for_grade(grade: str):
+async def get_subjects_for_grade(request: Request, grade: str):
     """Get available subjects for a specific grade."""
     try:
-        import json
-        from pathlib import Path
-        
-        curriculum_path = Path(__file__).resolve().parent / "data" / "curriculum_map.json"
-        
-        if not curriculum_path.exists():
-            raise HTTPException(status_code=500, detail="Curriculum map not found")
-            
-        with open(curriculum_path, 'r', encoding='utf-8') as f:
-            curriculum_data = json.load(f)
+        subjects = get_subjects_by_grade().get(grade)
         
-        if grade not in curriculum_data:
-            available_grades = list(curriculum_data.keys())
+        if subjects is None:
             raise HTTPException(
                 status_code=404,
-                detail=f"Grade '{grade}' not found. Available grades: {available_grades}"
+                detail=f"Grade '{grade}' not found. Available grades: {list_grades()}"
             )
             
-        return {
-            "grade": grade,
-            "subjects": list(curriculum_data[grade].keys())
-        }
+        return _static_json_response(
+            request, ("subjects", grade), subjects,
+            lambda: {"grade": grade, "subjects": subjects}
+        )
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error loading subjects: {str(e)}")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # With uvicorn[standard] installed, "auto" runs on uvloop (falling back
+    # to asyncio where it is unavailable, e.g. Windows); httptools is the C
+    # HTTP parser. A single worker unless WEB_CONCURRENCY says otherwise: cpu_count()
+    # reports the host's cores inside a container, and every extra worker holds its own
+    # curriculum and lesson plan caches. Past LIMIT_CONCURRENCY open connections a
+    # worker answers 503 instead of queueing.
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8000")),
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        limit_concurrency=int(os.getenv("LIMIT_CONCURRENCY", "64")),
+        loop="auto",
+        http="httptools",
+        log_level=LOG_LEVEL.lower(),
+    )
@@ -9,15 +9,21 @@ into a single hierarchical structure.
 Author: KlassIQ Backend Team
 """
 
-import json
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+import orjson
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Key added to every subject holding its sorted, de-duplicated topic names
+TOPICS_INDEX_KEY = "_TOPICS_INDEX"
+
 
 def validate_json_structure(data: Dict[str, Any]) -> bool:
     """
@@ -74,8 +80,7 @@ def load_subject_json(file_path: Path) -> Optional[Dict[str, Any]]:
         Dict containing the subject data or None if invalid
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        data = orjson.loads(file_path.read_bytes())
             
         if validate_json_structure(data):
             logger.info(f"Successfully loaded {file_path.name}")
@@ -84,7 +89,7 @@ def load_subject_json(file_path: Path) -> Optional[Dict[str, Any]]:
             logger.warning(f"Invalid structure in {file_path.name}")
             return None
             
-    except json.JSONDecodeError as e:
+    except orjson.JSONDecodeError as e:
         logger.error(f"JSON decode error in {file_path.name}: {e}")
         return None
     except Exception as e:
@@ -92,6 +97,56 @@ def load_subject_json(file_path: Path) -> Optional[Dict[str, Any]]:
         return None
 
 
+def extract_topic_names(subject_data: Any) -> List[str]:
+    """
+    Collect the names of all topics listed under any "TOPICS" key in a subject.
+    
+    Args:
+        subject_data: Parsed subject JSON
+        
+    Returns:
+        List[str]: De-duplicated topic names, sorted
+    """
+    topics = set()
+    stack = [subject_data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            listed = node.get("TOPICS")
+            if isinstance(listed, list):
+                for topic_item in listed:
+                    if isinstance(topic_item, dict) and "TOPIC NAME" in topic_item:
+                        topics.add(topic_item["TOPIC NAME"])
+            stack.extend(value for value in node.values() if isinstance(value, (dict, list)))
+        elif isinstance(node, list):
+            stack.extend(item for item in node if isinstance(item, (dict, list)))
+    return sorted(topics)
+
+
+def _prefetch(paths: List[Path]) -> None:
+    """
+    Ask the kernel to start reading every file now (POSIX_FADV_WILLNEED),
+    so disk reads overlap with parsing. No-op where posix_fadvise is unavailable.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            logger.debug(f"Could not prefetch {path.name}: {e}")
+
+
+def _load_one(task: Tuple[str, str, Path]) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """ProcessPool worker: load one subject file, returning it with its level and subject names."""
+    level_name, subject_name, json_file = task
+    return level_name, subject_name, load_subject_json(json_file)
+
+
 def merge_curriculums() -> Dict[str, Any]:
     """
     Main function to merge all curriculum JSON files into a single structure.
@@ -113,8 +168,9 @@ def merge_curriculums() -> Dict[str, Any]:
         raise FileNotFoundError(f"Curriculum data path not found: {base_path}")
     
     merged_curriculum = {}
+    tasks = []
     
-    # Process each level
+    # Collect the subject files of each level
     for level_name, folder_name in curriculum_levels.items():
         folder_path = base_path / folder_name
         
@@ -131,20 +187,26 @@ def merge_curriculums() -> Dict[str, Any]:
         
         for json_file in json_files:
             # Extract subject name from filename (remove .json extension)
-            subject_name = json_file.stem
+            tasks.append((level_name, json_file.stem, json_file))
+    
+    # Load and validate every file in parallel; map() keeps the original order
+    _prefetch([json_file for _, _, json_file in tasks])
+    with ProcessPoolExecutor() as executor:
+        results = list(executor.map(_load_one, tasks, chunksize=4))
+    
+    for (level_name, subject_name, subject_data), (_, _, json_file) in zip(results, tasks):
+        # Skip if already exists (shouldn't happen, but safety check)
+        if subject_name in merged_curriculum[level_name]:
+            logger.warning(f"Subject {subject_name} already exists in {level_name}")
+            continue
             
-            # Skip if already exists (shouldn't happen, but safety check)
-            if subject_name in merged_curriculum[level_name]:
-                logger.warning(f"Subject {subject_name} already exists in {level_name}")
-                continue
-                
-            # Load the subject data
-            subject_data = load_subject_json(json_file)
-            if subject_data is not None:
-                merged_curriculum[level_name][subject_name] = subject_data
-                logger.info(f"Added {subject_name} to {level_name}")
-            else:
-                logger.error(f"Failed to load {subject_name} from {json_file}")
+        if subject_data is not None:
+            # Precompute the /topics listing once here instead of on every request
+            subject_data[TOPICS_INDEX_KEY] = extract_topic_names(subject_data)
+            merged_curriculum[level_name][subject_name] = subject_data
+            logger.info(f"Added {subject_name} to {level_name}")
+        else:
+            logger.error(f"Failed to load {subject_name} from {json_file}")
     
     return merged_curriculum
 
@@ -169,9 +231,8 @@ def save_merged_curriculum(merged_data: Dict[str, Any], output_path: Path) -> bo
             logger.error("Merged data is empty")
             return False
             
-        # Save with pretty formatting
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(merged_data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        # Save with pretty formatting (byte-identical to json.dump(ensure_ascii=False, indent=2, sort_keys=True))
+        output_path.write_bytes(orjson.dumps(merged_data, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
             
         logger.info(f"Successfully saved merged curriculum to {output_path}")
         
@@ -2,12 +2,41 @@ import fitz  # PyMuPDF
 import os
 import re
 import json
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+try:
+    import orjson  # C encoder, several times faster than json.dump on this nested output
+except ImportError:  # optional: fall back to the stdlib encoder
+    orjson = None
+
 # === CONFIGURATION ===
 PDF_FOLDER = r".\pdfs\aep_curriculum_pdfs"
 OUTPUT_JSON = "AEP_master_curriculum.json"
 
+# Column boundaries (approximate; adjust if layout shifts)
+COLUMN_BOUNDARIES = {
+    "topic": (30, 120),
+    "performance_objectives": (120, 250),
+    "content": (250, 360),
+    "activities_teacher": (360, 470),
+    "activities_pupils": (470, 580),
+    "resources": (580, 690),
+    "evaluation": (690, 820)
+}
+# Table header cells (upper-cased) that are not content
+_TABLE_HEADERS = frozenset({"TOPIC", "CONTENT", "TEACHER", "PUPILS"})
+# Columns are contiguous: a span's column is one bisect over the left edges
+_COLUMN_EDGES = [low for low, _ in COLUMN_BOUNDARIES.values()] + [COLUMN_BOUNDARIES["evaluation"][1]]
+
+# Filename and header patterns, compiled once at import
+_RE_AEP_SUBJECT = re.compile(r"AEP\s*(.*?)\s*Level", re.IGNORECASE)
+_RE_AEP_LEVEL = re.compile(r"Level\s*(\d+)", re.IGNORECASE)
+_RE_GRADE = re.compile(r"PRIMARY\s*([1-6])")
+_RE_THEME = re.compile(r"THEME[:\s]*(.*)")
+_RE_SUB_THEME = re.compile(r"SUB\s*THEME[:\s]*(.*)")
+
 
 def parse_curriculum_pdf(pdf_path):
     """
@@ -17,7 +46,6 @@ def parse_curriculum_pdf(pdf_path):
     Works with PDFs that follow the NERDC curriculum layout
     — with columns for topic, objectives, content, teacher/pupil activities, etc.
     """
-    doc = fitz.open(pdf_path)
     curriculum_data = {
         "subject": None,
         "level": None,
@@ -26,8 +54,8 @@ def parse_curriculum_pdf(pdf_path):
 
     # --- Extract subject and level from filename ---
     filename = os.path.basename(pdf_path)
-    subject_match = re.search(r"AEP\s*(.*?)\s*Level", filename, re.IGNORECASE)
-    level_match = re.search(r"Level\s*(\d+)", filename, re.IGNORECASE)
+    subject_match = _RE_AEP_SUBJECT.search(filename)
+    level_match = _RE_AEP_LEVEL.search(filename)
 
     if subject_match:
         curriculum_data["subject"] = subject_match.group(1).strip().title()
@@ -38,104 +66,106 @@ def parse_curriculum_pdf(pdf_path):
     current_theme = ""
     current_sub_theme = ""
     current_topic_data = {}
+    column_targets = []
 
     # --- Process each page ---
-    for page_num, page in enumerate(doc, start=1):
-        try:
-            blocks = page.get_text("dict", flags=11)["blocks"]
-            page_text = page.get_text().upper()
-
-            # Identify grade (e.g. PRIMARY 1)
-            grade_match = re.search(r"PRIMARY\s*([1-6])", page_text)
-            if grade_match:
-                current_grade = f"Primary {grade_match.group(1)}"
-                if current_grade not in curriculum_data["grades"]:
-                    curriculum_data["grades"][current_grade] = {"themes": []}
-
-            # Identify theme
-            theme_match = re.search(r"THEME[:\s]*(.*)", page_text)
-            if theme_match:
-                new_theme = theme_match.group(1).strip().title()
-                if new_theme and new_theme != current_theme:
-                    current_theme = new_theme
-                    curriculum_data["grades"][current_grade]["themes"].append({
-                        "theme_name": current_theme,
-                        "sub_themes": []
-                    })
-
-            # Identify sub-theme
-            sub_theme_match = re.search(r"SUB\s*THEME[:\s]*(.*)", page_text)
-            if sub_theme_match:
-                new_sub_theme = sub_theme_match.group(1).strip().title()
-                if new_sub_theme and new_sub_theme != current_sub_theme:
-                    current_sub_theme = new_sub_theme
-                    current_theme_obj = curriculum_data["grades"][current_grade]["themes"][-1]
-                    current_theme_obj["sub_themes"].append({
-                        "sub_theme_name": current_sub_theme,
-                        "topics": []
-                    })
-
-            # Column boundaries (approximate; adjust if layout shifts)
-            column_boundaries = {
-                "topic": (30, 120),
-                "performance_objectives": (120, 250),
-                "content": (250, 360),
-                "activities_teacher": (360, 470),
-                "activities_pupils": (470, 580),
-                "resources": (580, 690),
-                "evaluation": (690, 820)
-            }
-
-            # Reference to last sub-theme object
+    with fitz.open(pdf_path) as doc:
+        for page_num, page in enumerate(doc, start=1):
             try:
-                current_sub_theme_obj = (
-                    curriculum_data["grades"][current_grade]["themes"][-1]["sub_themes"][-1]
-                )
-            except (KeyError, IndexError):
-                continue
-
-            # Process each text span
-            for block in blocks:
-                if "lines" not in block:
+                blocks = page.get_text("dict", flags=11)["blocks"]
+                if not blocks:
+                    # Image-only or blank page (flags=11 leaves image blocks out)
                     continue
-                for line in block["lines"]:
-                    for span in line["spans"]:
-                        text = span["text"].strip()
-                        x0 = span["bbox"][0]
-
-                        if not text or text.upper() in ["TOPIC", "CONTENT", "TEACHER", "PUPILS"]:
-                            continue
-
-                        # Start new topic
-                        if column_boundaries["topic"][0] <= x0 < column_boundaries["topic"][1] and len(text) > 3:
-                            if current_topic_data:
-                                current_sub_theme_obj["topics"].append(current_topic_data)
-
-                            current_topic_data = {
-                                "topic_name": text,
-                                "performance_objectives": [],
-                                "content": [],
-                                "activities": {"teacher": [], "pupils": []},
-                                "resources": [],
-                                "evaluation": []
-                            }
-
-                        elif current_topic_data:
-                            if column_boundaries["performance_objectives"][0] <= x0 < column_boundaries["performance_objectives"][1]:
-                                current_topic_data["performance_objectives"].append(text)
-                            elif column_boundaries["content"][0] <= x0 < column_boundaries["content"][1]:
-                                current_topic_data["content"].append(text)
-                            elif column_boundaries["activities_teacher"][0] <= x0 < column_boundaries["activities_teacher"][1]:
-                                current_topic_data["activities"]["teacher"].append(text)
-                            elif column_boundaries["activities_pupils"][0] <= x0 < column_boundaries["activities_pupils"][1]:
-                                current_topic_data["activities"]["pupils"].append(text)
-                            elif column_boundaries["resources"][0] <= x0 < column_boundaries["resources"][1]:
-                                current_topic_data["resources"].append(text)
-                            elif column_boundaries["evaluation"][0] <= x0 < column_boundaries["evaluation"][1]:
-                                current_topic_data["evaluation"].append(text)
-        except Exception as e:
-            print(f"⚠️ Error parsing page {page_num} in {pdf_path}: {e}")
-            continue
+                # Page text rebuilt from the same blocks instead of a second extraction
+                page_text = "\n".join(
+                    "".join(span["text"] for span in line["spans"])
+                    for block in blocks if "lines" in block
+                    for line in block["lines"]
+                ).upper()
+
+                # Identify grade (e.g. PRIMARY 1)
+                # Cheap substring checks first: most pages carry no header at all
+                grade_match = _RE_GRADE.search(page_text) if "PRIMARY" in page_text else None
+                if grade_match:
+                    current_grade = f"Primary {grade_match.group(1)}"
+                    if current_grade not in curriculum_data["grades"]:
+                        curriculum_data["grades"][current_grade] = {"themes": []}
+
+                # Identify theme
+                has_theme = "THEME" in page_text
+                theme_match = _RE_THEME.search(page_text) if has_theme else None
+                if theme_match:
+                    new_theme = theme_match.group(1).strip().title()
+                    if new_theme and new_theme != current_theme:
+                        current_theme = new_theme
+                        curriculum_data["grades"][current_grade]["themes"].append({
+                            "theme_name": current_theme,
+                            "sub_themes": []
+                        })
+
+                # Identify sub-theme
+                sub_theme_match = _RE_SUB_THEME.search(page_text) if has_theme and "SUB" in page_text else None
+                if sub_theme_match:
+                    new_sub_theme = sub_theme_match.group(1).strip().title()
+                    if new_sub_theme and new_sub_theme != current_sub_theme:
+                        current_sub_theme = new_sub_theme
+                        current_theme_obj = curriculum_data["grades"][current_grade]["themes"][-1]
+                        current_theme_obj["sub_themes"].append({
+                            "sub_theme_name": current_sub_theme,
+                            "topics": []
+                        })
+
+                # Reference to last sub-theme object
+                try:
+                    current_sub_theme_obj = (
+                        curriculum_data["grades"][current_grade]["themes"][-1]["sub_themes"][-1]
+                    )
+                except (KeyError, IndexError):
+                    continue
+
+                # Process each text span
+                for block in blocks:
+                    if "lines" not in block:
+                        continue
+                    for line in block["lines"]:
+                        for span in line["spans"]:
+                            text = span["text"].strip()
+                            x0 = span["bbox"][0]
+
+                            if not text or text.upper() in _TABLE_HEADERS:
+                                continue
+
+                            column = bisect_right(_COLUMN_EDGES, x0) - 1
+
+                            # Start new topic
+                            if column == 0 and len(text) > 3:
+                                if current_topic_data:
+                                    current_sub_theme_obj["topics"].append(current_topic_data)
+
+                                current_topic_data = {
+                                    "topic_name": text,
+                                    "performance_objectives": [],
+                                    "content": [],
+                                    "activities": {"teacher": [], "pupils": []},
+                                    "resources": [],
+                                    "evaluation": []
+                                }
+                                # Target lists in COLUMN_BOUNDARIES order (the topic column has none)
+                                column_targets = [
+                                    None,
+                                    current_topic_data["performance_objectives"],
+                                    current_topic_data["content"],
+                                    current_topic_data["activities"]["teacher"],
+                                    current_topic_data["activities"]["pupils"],
+                                    current_topic_data["resources"],
+                                    current_topic_data["evaluation"]
+                                ]
+
+                            elif current_topic_data and 0 < column < len(column_targets):
+                                column_targets[column].append(text)
+            except Exception as e:
+                print(f"⚠️ Error parsing page {page_num} in {pdf_path}: {e}")
+                continue
 
     # Append last topic
     try:
@@ -148,23 +178,36 @@ def parse_curriculum_pdf(pdf_path):
 
 
 def save_to_json(data, output_path):
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        with open(output_path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        # 256KB buffer: json.dump writes the indented output in many small pieces
+        with open(output_path, "w", encoding="utf-8", buffering=256 * 1024) as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
     print(f"✅ Saved {output_path}")
 
 
 def process_all_pdfs():
     """Processes all PDFs in the configured folder."""
-    all_results = []
     pdf_files = list(Path(PDF_FOLDER).glob("*.pdf"))
 
-    for pdf_file in pdf_files:
-        print(f"📘 Processing: {pdf_file.name}")
-        try:
-            parsed_data = parse_curriculum_pdf(str(pdf_file))
-            all_results.append(parsed_data)
-        except Exception as e:
-            print(f"⚠️ Error processing {pdf_file.name}: {e}")
+    # Each PDF is parsed in its own process. Progress and errors are reported
+    # as each file finishes; the results are saved in file order.
+    results = {}
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, 6)) as executor:
+        futures = {}
+        for pdf_file in pdf_files:
+            print(f"📘 Queued: {pdf_file.name}")
+            futures[executor.submit(parse_curriculum_pdf, str(pdf_file))] = pdf_file
+        for future in as_completed(futures):
+            pdf_file = futures[future]
+            try:
+                results[pdf_file] = future.result()
+                print(f"✔️ Parsed: {pdf_file.name}")
+            except Exception as e:
+                print(f"⚠️ Error processing {pdf_file.name}: {e}")
+    all_results = [results[pdf_file] for pdf_file in pdf_files if pdf_file in results]
 
     save_to_json(all_results, OUTPUT_JSON)
     print(f"\n🎯 Extraction complete! {len(all_results)} PDFs processed.")
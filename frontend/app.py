@@ -1,6 +1,9 @@
+import time
 import streamlit as st
 import requests
-import json
+import orjson
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 # Removed unused import: traceback
 
 from components.lesson_display import render_lesson_plan
@@ -16,6 +19,96 @@ st.set_page_config(
 # Configuration
 # NOTE: Using HTTPS for the live deployment URL
 API_BASE_URL = "https://klassiq.onrender.com"
+# Request bodies are pre-encoded with orjson and sent as data=
+JSON_HEADERS = {"Content-Type": "application/json"}
+# Successful plans are reused for identical payloads for an hour
+PLAN_CACHE_TTL_SECONDS = 3600
+PLAN_CACHE_MAX_ENTRIES = 256
+
+
+@st.cache_resource
+def get_session():
+    """One pooled keep-alive session per server process, so reruns reuse the TLS connection."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        # Retry's default allowed_methods leave POST out of read retries, so only
+        # failed connects are retried and a slow generation is never sent twice
+        max_retries=Retry(total=2, backoff_factor=0.2)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+@st.cache_resource
+def get_plan_cache() -> dict:
+    """Payload -> (stored_at, response body), shared by every session and by the streamed and blocking paths."""
+    return {}
+
+
+def _plan_cache_key(payload: dict) -> bytes:
+    return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+
+
+def cached_plan(payload: dict):
+    """Return the stored response for an identical payload from the last hour, or None."""
+    entry = get_plan_cache().get(_plan_cache_key(payload))
+    if entry is not None and time.monotonic() - entry[0] < PLAN_CACHE_TTL_SECONDS:
+        return entry[1]
+    return None
+
+
+def remember_plan(payload: dict, data: dict) -> None:
+    """Store a successful response so resubmitting identical inputs skips the backend round-trip."""
+    result = data.get("result")
+    if not result or "error" in result:
+        return
+    cache = get_plan_cache()
+    cache[_plan_cache_key(payload)] = (time.monotonic(), data)
+    # Dicts keep insertion order, so the first entries are the oldest
+    while len(cache) > PLAN_CACHE_MAX_ENTRIES:
+        cache.pop(next(iter(cache)), None)
+
+
+def generate_plan(payload: dict) -> dict:
+    """POST the lesson request and return the decoded response body."""
+    resp = get_session().post(f"{API_BASE_URL}/generate-plan", data=orjson.dumps(payload), headers=JSON_HEADERS, timeout=90)
+    resp.raise_for_status() # Raises HTTPError for 4xx/5xx status codes
+    return orjson.loads(resp.content)
+
+
+def open_plan_stream(payload: dict):
+    """
+    Start a streamed generation on /generate-plan/stream.
+
+    Returns the open response, or None when the server has no streaming
+    endpoint (404/405 or a non event-stream reply) so the caller can fall back.
+    """
+    resp = get_session().post(
+        f"{API_BASE_URL}/generate-plan/stream", data=orjson.dumps(payload), headers=JSON_HEADERS, stream=True, timeout=90
+    )
+    if resp.status_code not in (404, 405):
+        resp.raise_for_status()
+        if resp.headers.get("Content-Type", "").startswith("text/event-stream"):
+            return resp
+    resp.close()
+    return None
+
+
+def iter_plan_events(resp):
+    """Yield (event, data) for each named Server-Sent Event; raw text frames are skipped."""
+    event = None
+    # chunk_size=None hands over each chunk as soon as it arrives
+    for line in resp.iter_lines(chunk_size=None):
+        if not line:
+            event = None
+        elif line.startswith(b"event:"):
+            event = line[6:].strip().decode()
+        elif event and line.startswith(b"data:"):
+            yield event, orjson.loads(line[5:])
+
 
 st.title("KlassIQ 📘")
 st.markdown("**AI Lesson Design Assistant for Nigerian Educators**")
@@ -79,29 +172,50 @@ if submit:
                 "output_mode": "short" if "Short" in mode else "full"
             }
             
+            # Sections are drawn here as they stream in, then replaced by the full plan
+            plan_area = st.empty()
+            
             try:
-                # Network Request
-                resp = requests.post(f"{API_BASE_URL}/generate-plan", json=payload, timeout=90)
-                resp.raise_for_status() # Raises HTTPError for 4xx/5xx status codes
-                
-                # JSON Parsing
-                data = resp.json()
-                result = data.get("result", {})
+                # Identical inputs from the last hour are shown without contacting the backend
+                data = cached_plan(payload)
+                if data is None:
+                    resp = open_plan_stream(payload)
+                    if resp is None:
+                        # Network Request and JSON Parsing
+                        data = generate_plan(payload)
+                    else:
+                        data = {"result": {"error": "The lesson plan stream ended before it was complete."}}
+                        sections = {}
+                        with resp:
+                            for event, event_data in iter_plan_events(resp):
+                                if event == "section":
+                                    sections[event_data["key"]] = event_data["value"]
+                                    with plan_area.container():
+                                        render_lesson_plan(sections, partial=True)
+                                elif event == "done":
+                                    data = event_data
+                                elif event == "error":
+                                    data = {"result": {"error": event_data.get("error", "Unknown error")}}
+                    remember_plan(payload, data)
+                result = data.get("result") or {}
                 
             except requests.exceptions.RequestException as e:
                 # Catch connection, timeout, and HTTP status errors
+                plan_area.empty()
                 st.error(f"API CONNECTION ERROR. Server URL: `{API_BASE_URL}`")
                 st.code(f"Details: {e}", language='text')
                 st.stop()
             
-            except json.JSONDecodeError:
-                # Catch bad JSON response
+            except orjson.JSONDecodeError as e:
+                # Catch bad JSON response (e.doc is the raw body)
+                plan_area.empty()
                 st.error("RESPONSE FORMAT ERROR. Server returned invalid data.")
-                st.code(f"Raw Response: {resp.text[:500]}...", language='text')
+                st.code(f"Raw Response: {e.doc[:500]}...", language='text')
                 st.stop()
             
             # 3. Backend Logic Check (LLM/Parsing Failure)
             if "error" in result:
+                plan_area.empty()
                 st.error("GENERATION FAILED. The backend encountered an error.")
                 st.code(result.get("error", "Unknown error"), language='text')
                 
@@ -112,15 +226,16 @@ if submit:
                 
             # 4. Success and Rendering
             if result:
-                st.success("✅ Lesson Plan Generated Successfully!")
-                
-                # Render the plan
-                render_lesson_plan(result)
+                with plan_area.container():
+                    st.success("✅ Lesson Plan Generated Successfully!")
+                    
+                    # Render the plan
+                    render_lesson_plan(result)
 
                 # Downloadable JSON file
                 st.download_button(
                     label="Download Lesson Plan JSON",
-                    data=json.dumps(result, indent=2),
+                    data=orjson.dumps(result, option=orjson.OPT_INDENT_2),
                     file_name=f"{topic.replace(' ', '_')}_lesson_plan.json",
                     mime="application/json"
                 )
\ No newline at end of file
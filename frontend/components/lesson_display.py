@@ -1,93 +1,115 @@
 import streamlit as st
 
-def render_lesson_plan(data: dict):
-    """Renders the structured lesson plan data neatly in the Streamlit UI."""
+# Section order: (display title, lesson plan key)
+SECTIONS = (
+    ("Objectives", "objectives"),
+    ("Learning Outcomes", "learning_outcomes"),
+    ("Introduction", "introduction"),
+    ("Activities", "activities"),
+    ("Differentiation", "differentiation"),
+    ("Materials", "materials"),
+    ("Assessment", "assessment"),
+    ("Classroom Management", "classroom_management"),
+    ("Extension", "extension"),
+    ("Low-Data Version", "low_data_version"),
+    ("Notes", "notes"),
+)
+
+
+def _render_list(title, content, buf):
+    """Lists of activity dicts (Activities, Low-Data Version) or of plain strings."""
+    # Handle LISTS OF DICTIONARIES (e.g., Main Activities)
+    if title in ("Activities", "Low-Data Version") and content and isinstance(content[0], dict):
+        for i, item in enumerate(content):
+            name = item.get('name', f'Activity {i+1}')
+            buf.append(f"**{i+1}. {name}**")
+            
+            details = []
+            if 'description' in item:
+                details.append(f"Description: {item['description']}")
+            if 'duration' in item:
+                details.append(f"Duration: {item['duration']}")
+                
+            if details:
+                # &emsp; provides horizontal spacing
+                buf.append(f"&emsp;* {'; '.join(details)}")
+            buf.append("---")
+            
+    # Handle LISTS OF STRINGS (e.g., Objectives, Learning Outcomes)
+    else:
+        buf.append("\n".join(f"- {str(item)}" for item in content))
+
+
+def _render_dict(title, content, buf):
+    """The nested 'Low-Data Version' plan, or a generic key/value dict."""
+    # Handle the specific nested DICT structure of 'Low-Data Version'
+    if title == "Low-Data Version" and "activities" in content:
+        buf.append("##### Minimal Plan Details:")
+        for key, value in content.items():
+            if key == 'objectives' and isinstance(value, list):
+                buf.append("**Objectives:**")
+                buf.append("\n".join(f"- {obj}" for obj in value))
+            elif key == 'activities' and isinstance(value, list):
+                buf.append("**Activities:**")
+                # Render nested activities list
+                for i, activity in enumerate(value):
+                    buf.append(f"**{i+1}. {activity.get('name', 'Activity')}**")
+                    if 'description' in activity:
+                        buf.append(f"&emsp;* Description: {activity['description']}")
+                
+    # Handle Generic DICTIONARY (e.g., Differentiation)
+    else:
+        for k, v in content.items():
+            # Standard title case formatting for keys
+            buf.append(f"**{k.replace('_', ' ').title()}:** {v}")
+
+
+def _render_str(title, content, buf):
+    # Handle single STRING content (e.g., Introduction, Notes)
+    buf.append(content)
+
+
+def _render_none(title, content, buf):
+    buf.append("_No content provided for this section._")
+
+
+# Section renderers keyed on the exact JSON type of the content
+_RENDERERS = {list: _render_list, dict: _render_dict, str: _render_str}
+
+
+def render_lesson_plan(data: dict, partial: bool = False):
+    """
+    Renders the structured lesson plan data neatly in the Streamlit UI.
+
+    Pass partial=True while a plan is still streaming in, so sections that
+    haven't arrived yet aren't reported as missing.
+    """
     
     # 1. Initial Data Check
     if not data or data.get('error'):
         st.warning("⚠️ Cannot display the lesson plan: data is missing or contains an error.")
         return
         
-    st.markdown("### Lesson Plan Overview")
-    st.markdown(f"#### {data.get('title', 'Untitled Lesson Plan')}")
-    st.markdown("---")
-
-    # 2. Define Section Order and Content Retrieval
-    sections = [
-        ("Objectives", data.get("objectives")),
-        ("Learning Outcomes", data.get("learning_outcomes")),
-        ("Introduction", data.get("introduction")),
-        ("Activities", data.get("activities")),
-        ("Differentiation", data.get("differentiation")),
-        ("Materials", data.get("materials")),
-        ("Assessment", data.get("assessment")),
-        ("Classroom Management", data.get("classroom_management")),
-        ("Extension", data.get("extension")),
-        ("Low-Data Version", data.get("low_data_version")),
-        ("Notes", data.get("notes")),
-    ]
-
-    # 3. Render Sections
-    for title, content in sections:
-        # Check if the content is a list of complex objects (Activities or Low-Data)
-        is_nested_list = title in ("Activities", "Low-Data Version")
+    st.markdown(f"### Lesson Plan Overview\n\n#### {data.get('title', 'Untitled Lesson Plan')}\n\n---")
+
+    # 2. Render Sections (content is looked up as each section is drawn)
+    missing = []
+    for title, field in SECTIONS:
+        content = data.get(field)
+        # No expander for empty sections (common in short plans and while streaming)
+        if content in (None, "", [], {}):
+            missing.append(title)
+            continue
         
         # Keep 'Objectives' expanded by default
         expanded_state = (title == "Objectives")
         
         with st.expander(f"📚 {title}", expanded=expanded_state):
-            
-            if isinstance(content, list):
-                
-                # Handle LISTS OF DICTIONARIES (e.g., Main Activities)
-                if is_nested_list and content and isinstance(content[0], dict):
-                    for i, item in enumerate(content):
-                        name = item.get('name', f'Activity {i+1}')
-                        st.markdown(f"**{i+1}. {name}**")
-                        
-                        details = []
-                        if 'description' in item:
-                            details.append(f"Description: {item['description']}")
-                        if 'duration' in item:
-                            details.append(f"Duration: {item['duration']}")
-                            
-                        if details:
-                            # &emsp; provides horizontal spacing
-                            st.markdown(f"&emsp;* {'; '.join(details)}")
-                        st.markdown("---")
-                        
-                # Handle LISTS OF STRINGS (e.g., Objectives, Learning Outcomes)
-                else:
-                    for item in content:
-                        st.markdown(f"- {str(item)}")
-                        
-            elif isinstance(content, dict):
-                
-                # Handle the specific nested DICT structure of 'Low-Data Version'
-                if title == "Low-Data Version" and "activities" in content:
-                    st.markdown("##### Minimal Plan Details:")
-                    for key, value in content.items():
-                        if key == 'objectives' and isinstance(value, list):
-                            st.markdown("**Objectives:**")
-                            for obj in value:
-                                st.markdown(f"- {obj}")
-                        elif key == 'activities' and isinstance(value, list):
-                            st.markdown("**Activities:**")
-                            # Render nested activities list
-                            for i, activity in enumerate(value):
-                                st.markdown(f"**{i+1}. {activity.get('name', 'Activity')}**")
-                                if 'description' in activity:
-                                     st.markdown(f"&emsp;* Description: {activity['description']}")
-                                
-                # Handle Generic DICTIONARY (e.g., Differentiation)
-                else:
-                    for k, v in content.items():
-                        # Standard title case formatting for keys
-                        st.markdown(f"**{k.replace('_', ' ').title()}:** {v}")
-                        
-            elif isinstance(content, str):
-                # Handle single STRING content (e.g., Introduction, Notes)
-                st.markdown(content)
-
-            else:
-                st.markdown("_No content provided for this section._")
\ No newline at end of file
+            # Renderers append markdown pieces; the section goes out as one message.
+            # Blank lines keep each piece its own paragraph (and "---" a rule).
+            buf = []
+            _RENDERERS.get(type(content), _render_none)(title, content, buf)
+            st.markdown("\n\n".join(buf))
+
+    if missing and not partial:
+        st.caption("No content provided for: " + ", ".join(missing))
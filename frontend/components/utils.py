@@ -1,4 +1,4 @@
 # Supported local languages (kept for list definition, even if translation is unused)
-LANGUAGES = ["English", "Hausa", "Yoruba", "Igbo"]
+LANGUAGES = ("English", "Hausa", "Yoruba", "Igbo")
 
 # Removed: translate_text function
\ No newline at end of file